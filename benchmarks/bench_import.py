@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+# Measures cold start, the time a fresh interpreter takes to import each module
+# Run from the repo root:
+#   python -m benchmarks.bench_import --output import.json --max-ms 500
+# Exits with status 1 if any module takes longer than --max-ms to import
+
+MODULES = (
+    "src.synth_engine",
+    "src.render_plan",
+    "src.voice_pool",
+    "src.realtime_engine",
+    "src.midi_render",
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_ms(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def _baseline_ms() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], cwd=ROOT, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+# Slowest imports by cumulative time, from python -X importtime
+def slowest_imports(module: str, count: int = 10) -> List[Tuple[str, float]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda i: i[1], reverse=True)[:count]
+
+
+def run(repeats: int = 5) -> Dict[str, Any]:
+    interpreter = min(_baseline_ms() for _ in range(repeats))
+    results = []
+    for module in MODULES:
+        times = [_import_ms(module) for _ in range(repeats)]
+        results.append(
+            {
+                "module": module,
+                "min_ms": min(times),
+                "median_ms": statistics.median(times),
+                # Time spent on the import itself, without interpreter start up
+                "import_ms": min(times) - interpreter,
+                "slowest": slowest_imports(module),
+            }
+        )
+
+    return {
+        "python": sys.version.split()[0],
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "interpreter_ms": interpreter,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark module import time")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, help="fail above this import time")
+    args = parser.parse_args()
+
+    report = run(args.repeats)
+
+    print(f"interpreter start up: {report['interpreter_ms']:.0f}ms")
+    for r in report["results"]:
+        print(
+            f"{r['module']:<22} {r['import_ms']:>7.0f}ms (median {r['median_ms']:.0f}ms)"
+        )
+        for name, ms in r["slowest"][:3]:
+            print(f"    {name:<40} {ms:>7.1f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_ms is not None:
+        slow = [r for r in report["results"] if r["import_ms"] > args.max_ms]
+        for r in slow:
+            print(
+                f"TOO SLOW {r['module']}: {r['import_ms']:.0f}ms > {args.max_ms:.0f}ms"
+            )
+        if slow:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
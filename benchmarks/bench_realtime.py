@@ -0,0 +1,306 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from src.envelopes import ADSREnvelope
+from src.instruments import sine_keys
+from src.modifier import (
+    ConvolutionReverb,
+    Delay,
+    Filter,
+    ModulatedDelay,
+    ModulatedFilter,
+    ModulatedPanner,
+    ModulatedVolume,
+    Panner,
+    Volume,
+)
+from src.modulator import ControlRate, ModulatedOscillator, array_mod
+from src.oscillators.noise import FBMNoise, PinkNoise, WhiteNoise
+from src.oscillators.oscillators import (
+    SawtoothOscillator,
+    SineOscillator,
+    SquareOscillator,
+    TriangleOscillator,
+)
+from src.oscillators.plucked_string import PluckedString, PluckedStrings
+from src.oscillators.unison import UnisonOscillator
+from src.render_plan import compile_graph
+from src.voice_pool import VoicePool
+from src.wave_chain import Chain, WaveAdder
+
+# Measures samples per second and realtime factor for every generator and modifier
+# Run from the repo root:
+#   python -m benchmarks.bench_realtime --output bench.json
+#   python -m benchmarks.bench_realtime --compare bench.json
+# Comparing exits with status 1 if any case got slower than the threshold allows
+
+SAMPLE_RATE = 44100
+BLOCK_SIZES = (64, 256, 1024, 4096)
+POLYPHONY = (1, 8, 32)
+
+
+@array_mod
+def amp_mod(init_amp: float, env: float) -> float:
+    return env * init_amp
+
+
+@array_mod
+def freq_mod(init_freq: float, val: float) -> float:
+    return init_freq * (1 + 0.01 * val)
+
+
+def synth_engine_graph() -> Any:
+    # Imported here so the other cases don't pay for the engine's imports
+    from src.synth_engine import SynthEngine
+
+    return SynthEngine().build_graph()
+
+
+# Two second decaying noise, stands in for a recorded room
+def impulse_response() -> np.ndarray:
+    t = np.arange(2 * SAMPLE_RATE) / SAMPLE_RATE
+    noise = np.random.default_rng(0).standard_normal((len(t), 2))
+    return noise * np.exp(-3 * t)[:, None]
+
+
+# Each case builds a fresh graph, so every measurement starts from the same state
+CASES: Dict[str, Callable[[], Any]] = {
+    "SineOscillator": lambda: SineOscillator(),
+    "SquareOscillator": lambda: SquareOscillator(),
+    "SawtoothOscillator": lambda: SawtoothOscillator(),
+    "TriangleOscillator": lambda: TriangleOscillator(),
+    "ADSREnvelope": lambda: ADSREnvelope(),
+    "ModulatedOscillator": lambda: ModulatedOscillator(
+        SineOscillator(),
+        ADSREnvelope(),
+        SineOscillator(freq=5),
+        amp_mod=amp_mod,
+        freq_mod=freq_mod,
+    ),
+    "ModulatedOscillator control rate": lambda: ModulatedOscillator(
+        SineOscillator(),
+        ControlRate(ADSREnvelope()),
+        ControlRate(SineOscillator(freq=5)),
+        amp_mod=amp_mod,
+        freq_mod=freq_mod,
+    ),
+    "WaveAdder": lambda: WaveAdder(SineOscillator(), TriangleOscillator(freq=220)),
+    "WaveAdder pruned x8": lambda: WaveAdder(
+        *[PluckedString(55.0 * 2 ** (i / 12), decay=0.05) for i in range(8)]
+    ),
+    "Chain": lambda: Chain(SineOscillator(), Volume(0.5), Volume(2.0)),
+    "Panner": lambda: Chain(SineOscillator(), Panner(0.3)),
+    "Volume": lambda: Chain(SineOscillator(), Volume(0.5)),
+    "ModulatedPanner": lambda: Chain(
+        SineOscillator(), ModulatedPanner(SineOscillator(freq=2))
+    ),
+    "ModulatedVolume": lambda: Chain(SineOscillator(), ModulatedVolume(ADSREnvelope())),
+    "ModulatedVolume control rate": lambda: Chain(
+        SineOscillator(), ModulatedVolume(ControlRate(ADSREnvelope()))
+    ),
+    "Filter": lambda: Chain(SawtoothOscillator(), Filter(1000, 2.0)),
+    "ModulatedFilter": lambda: Chain(
+        SawtoothOscillator(),
+        ModulatedFilter(SineOscillator(freq=2, wave_range=(200, 4000))),
+    ),
+    "ConvolutionReverb": lambda: Chain(
+        SineOscillator(), ConvolutionReverb(impulse_response())
+    ),
+    "WhiteNoise": lambda: WhiteNoise(),
+    "PinkNoise": lambda: PinkNoise(),
+    "FBMNoise": lambda: FBMNoise(),
+    "UnisonOscillator x16": lambda: UnisonOscillator(
+        SawtoothOscillator(110.0), voices=16, detune=40, stereo_spread=1.0
+    ),
+    "PluckedString": lambda: PluckedString(110.0),
+    "PluckedStrings x64": lambda: PluckedStrings(
+        np.geomspace(82.41, 1318.5, 64), [1 / 64] * 64, strum=0.005
+    ),
+    "Delay": lambda: Chain(
+        SawtoothOscillator(),
+        Delay(0.3, 0.5, taps=[(0.1, 0.6), (0.3, 0.4)], feedback_filter=Filter(3000)),
+    ),
+    "ModulatedDelay": lambda: Chain(
+        SawtoothOscillator(),
+        ModulatedDelay(
+            SineOscillator(freq=0.5, wave_range=(-0.002, 0.002)),
+            time=0.01,
+            max_delay=0.02,
+        ),
+    ),
+    "SynthEngine.run": synth_engine_graph,
+}
+
+
+def _best_of(repeats: int, render: Callable[[], None]) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        render()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _result(
+    name: str,
+    mode: str,
+    samples: int,
+    seconds: float,
+    block_size: Optional[int] = None,
+    voices: Optional[int] = None,
+) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "mode": mode,
+        "block_size": block_size,
+        "voices": voices,
+        "samples": samples,
+        "seconds": seconds,
+        "samples_per_sec": samples / seconds,
+        "realtime_factor": samples / SAMPLE_RATE / seconds,
+    }
+
+
+def bench_case(
+    name: str, build: Callable[[], Any], duration: float, repeats: int
+) -> List[Dict[str, Any]]:
+    results = []
+    samples = int(duration * SAMPLE_RATE)
+
+    # Per-sample rendering is slow, so it gets a shorter render
+    sample_count = samples // 8
+    gen = build()
+
+    def render_samples() -> None:
+        iter(gen)
+        for _ in range(sample_count):
+            next(gen)
+
+    seconds = _best_of(repeats, render_samples)
+    results.append(_result(name, "sample", sample_count, seconds))
+
+    for block_size in BLOCK_SIZES:
+        plan = compile_graph(build(), block_size)
+
+        def render_blocks() -> None:
+            iter(plan)
+            for _ in range(samples // block_size):
+                plan.next_block(block_size)
+
+        rendered = samples // block_size * block_size
+        seconds = _best_of(repeats, render_blocks)
+        results.append(_result(name, "plan", rendered, seconds, block_size))
+
+    return results
+
+
+def bench_polyphony(duration: float, repeats: int) -> List[Dict[str, Any]]:
+    results = []
+    samples = int(duration * SAMPLE_RATE)
+
+    for voices in POLYPHONY:
+        for block_size in BLOCK_SIZES:
+            pool = VoicePool(sine_keys, voices, block_size=block_size)
+
+            def render_pool() -> None:
+                iter(pool)
+                for note in range(voices):
+                    pool.note_on(48 + note % 36)
+                for _ in range(samples // block_size):
+                    pool.next_block(block_size)
+
+            rendered = samples // block_size * block_size
+            seconds = _best_of(repeats, render_pool)
+            results.append(
+                _result("VoicePool", "plan", rendered, seconds, block_size, voices)
+            )
+
+    return results
+
+
+def _key(result: Dict[str, Any]) -> str:
+    return (
+        f"{result['name']}/{result['mode']}/{result['block_size']}/{result['voices']}"
+    )
+
+
+# Lists every case whose samples/sec dropped by more than threshold, as a fraction
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[str]:
+    before = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(_key(result))
+        if old is None:
+            continue
+        change = result["samples_per_sec"] / old["samples_per_sec"] - 1
+        if change < -threshold:
+            regressions.append(f"{_key(result)}: {change:+.1%}")
+    return regressions
+
+
+def run(
+    duration: float = 1.0, repeats: int = 3, only: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    results = []
+    for name, build in CASES.items():
+        if only and name not in only:
+            continue
+        try:
+            results.extend(bench_case(name, build, duration, repeats))
+        except ImportError as err:
+            print(f"skipping {name}: {err}", file=sys.stderr)
+
+    if not only or "VoicePool" in only:
+        results.extend(bench_polyphony(duration, repeats))
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sample_rate": SAMPLE_RATE,
+        "duration": duration,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generators and modifiers")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="case names to run")
+    args = parser.parse_args()
+
+    report = run(args.duration, args.repeats, args.only)
+
+    for r in report["results"]:
+        print(
+            f"{r['name']:<20} {r['mode']:<6} block={str(r['block_size']):<5} "
+            f"voices={str(r['voices']):<3} {r['samples_per_sec']:>14,.0f} samples/s "
+            f"{r['realtime_factor']:>9.1f}x realtime"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
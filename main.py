@@ -1,10 +1,29 @@
 import sys
+import time
 
 from src.synth_engine import SynthEngine
-import pygame.midi
+from src.envelopes import ADSREnvelope
+from src.midi_input import MidiInput, PygameMidiSource
+from src.modulator import ModulatedOscillator, array_mod
+from src.oscillators.oscillators import SineOscillator
+from src.realtime_engine import RealtimeEngine, SoundDeviceSink
+from src.voice_pool import VoicePool
 from PyQt6.QtWidgets import QApplication, QLabel, QWidget
 
 
+@array_mod
+def amp_mod(init_amp: float, env: float) -> float:
+    return env * init_amp
+
+
+def patch():
+    return ModulatedOscillator(
+        SineOscillator(),
+        ADSREnvelope(0.01, 0.1, 0.6, 0.3),
+        amp_mod=amp_mod,
+    )
+
+
 def main():
     # Debug PyQT App
     # app = QApplication([])
@@ -20,19 +39,21 @@ def main():
     # sys.exit(app.exec())
 
     # MIDI App
-    pygame.midi.init()
-    
-    default_id = pygame.midi.get_default_input_id()
-    midi_input = pygame.midi.Input(device_id=default_id)
-    try: 
+    pool = VoicePool(patch, voices=8, block_size=256)
+    engine = RealtimeEngine(pool, SoundDeviceSink(), block_size=256)
+    midi_input = MidiInput(PygameMidiSource(), pool, latency=256)
+
+    engine.start()
+    midi_input.start()
+    try:
         while True:
-            if midi_input.poll():
-                print(midi_input.read(num_events=16))
+            time.sleep(1)
+            print(f"Events: {midi_input.received}, underruns: {engine.stats.underruns}")
     except KeyboardInterrupt as err:
         print("Stopping...")
-    
-    pygame.midi.quit()
 
+    midi_input.stop()
+    engine.stop()
 
     # Synthesizer Instrument Generation
     # engine: SynthEngine = SynthEngine()
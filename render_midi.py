@@ -0,0 +1,80 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import numpy.typing as npt
+
+from src.midi_file import read_midi_file
+from src.midi_render import mixdown, plan_jobs, render_tracks
+from src.wav_writer import WavWriter
+
+
+# Writes at the rate the audio was rendered at, so the header matches the samples
+def _write_wav(
+    path: str, audio: npt.NDArray[np.float64], args: argparse.Namespace
+) -> None:
+    channels = 1 if audio.ndim == 1 else 2
+    with WavWriter(
+        path,
+        channels=channels,
+        sample_rate=args.sample_rate,
+        bit_depth=args.bit_depth,
+    ) as writer:
+        writer.write(audio)
+
+
+# Renders Standard MIDI Files to WAV, one worker process per track
+# e.g. python render_midi.py song.mid other.mid --out-dir renders --stems
+def main():
+    parser = argparse.ArgumentParser(description="Render MIDI files to WAV")
+    parser.add_argument("midi_files", nargs="+")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--stems", action="store_true", help="also write each track")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--bit-depth", type=int, default=16, choices=(16, 24, 32))
+    parser.add_argument("--amp", type=float, default=0.25)
+    parser.add_argument("--tail", type=float, default=2.0)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    for path in args.midi_files:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "rb") as f:
+            midi = read_midi_file(f)
+
+        jobs = plan_jobs(
+            midi, args.sample_rate, tail=args.tail, block_size=args.block_size
+        )
+        if not jobs:
+            print(f"{path}: no notes, skipping")
+            continue
+
+        start = time.perf_counter()
+        results = render_tracks(jobs, args.workers)
+        elapsed = time.perf_counter() - start
+
+        for result in results:
+            print(
+                f"{name} track {result.index} '{result.name}': "
+                f"{result.render_seconds:.2f}s, {result.realtime_factor:.1f}x realtime"
+            )
+            if args.stems:
+                stem_path = os.path.join(
+                    args.out_dir, f"{name}_track{result.index}.wav"
+                )
+                _write_wav(stem_path, result.stem * args.amp, args)
+
+        mix = mixdown([result.stem for result in results])
+        out_path = os.path.join(args.out_dir, f"{name}.wav")
+        _write_wav(out_path, mix * args.amp, args)
+
+        duration = len(mix) / results[0].sample_rate
+        print(f"{name}: {duration:.1f}s of audio in {elapsed:.2f}s -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
-from abc import ABC, abstractmethod
-import itertools
-from typing import Optional, Iterator, List
+from abc import ABC
+import math
+from typing import Any, Dict, Optional, Tuple, Union
+import numpy as np
+import numpy.typing as npt
+from src.helpers import jit, kernels
+from src.helpers.describe import type_name
 
 
 # Generic class to contain ADSR and ADBSSR
@@ -16,8 +20,16 @@ class Envelope(ABC):
 
 
 class ADSREnvelope(Envelope):
-    # The stepper is a generator that returns a float for a wavelength at a given time
-    _stepper: Optional[Iterator[float]]
+    # Stages run in order, sustain holds until a release is triggered
+    ATTACK, DECAY, SUSTAIN, RELEASE, ENDED = range(5)
+
+    _stage: Optional[int]
+    # Samples elapsed in the current stage
+    _t: int
+    # Level the release ramps down from
+    _release_level: float
+    # Samples until a scheduled release starts
+    _release_in: Optional[int]
 
     def __init__(
         self,
@@ -26,87 +38,175 @@ class ADSREnvelope(Envelope):
         sustain_level: float = 0.7,
         release_duration: float = 0.3,
         sample_rate: int = 44100,
+        curve: float = 0.0,
     ) -> None:
         self.attack_duration = attack_duration
         self.decay_duration = decay_duration
         self.sustain_level = sustain_level
         self.release_duration = release_duration
         self._sample_rate = sample_rate
+        # 0 gives linear ramps, higher values bend each ramp into an exponential curve
+        self.curve = curve
         self.val = 0.0
         self.ended = False
-        self._stepper = None
-
-    def get_ads_stepper(self) -> Iterator[float]:
-        steppers: List[Iterator[float]] = []
-
-        # Iter count generates inf floats given a rule (e.g. step)
-        if self.attack_duration > 0:
-            steppers.append(
-                itertools.count(
-                    start=0, step=1 / (self.attack_duration * self._sample_rate)
-                )
-            )
-        if self.decay_duration > 0:
-            steppers.append(
-                itertools.count(
-                    start=1,
-                    step=-(1 - self.sustain_level)
-                    / (self.decay_duration * self._sample_rate),
-                )
-            )
-
-        # Switch between ADR between points
-        # When amp (val) reaches 1, attack stops
-        # Decay stops when val reaches sustain
-        # Sustain stops when note is stopped (only via trigger release)
-        # Release stops when amp reaches 0
-        while True:
-            l = len(steppers)
-            if l > 0:
-                val = next(steppers[0])
-                if l == 2 and val > 1:
-                    steppers.pop(0)
-                    val = next(steppers[0])
-                elif l == 1 and val < self.sustain_level:
-                    steppers.pop(0)
-                    val = self.sustain_level
-            else:
-                val = self.sustain_level
-            yield val
-
-    def get_r_stepper(self) -> Iterator[float]:
-        val: float = self.val
-
-        if self.release_duration > 0:
-            release_step = -self.val / (self.release_duration * self._sample_rate)
-            stepper = itertools.count(self.val, step=release_step)
-        else:
-            # Exit
-            val = -1
-            stepper = iter([0.0])  # dummy to avoid unbound error
-
-        while True:
-            if val <= 0:
-                self.ended = True
-                val = 0.0
-            else:
-                val = next(stepper)
-            yield val
+        self._stage = None
+        self._t = 0
+        self._release_level = 0.0
+        self._release_in = None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "attack_duration": self.attack_duration,
+            "decay_duration": self.decay_duration,
+            "sustain_level": self.sustain_level,
+            "release_duration": self.release_duration,
+            "sample_rate": self._sample_rate,
+            "curve": self.curve,
+        }
+
+    # Divides the sample rate, stages are timed against it as they run
+    def run_slower(self, period: int) -> None:
+        self._sample_rate = self._sample_rate / period
+
+    def _shape(
+        self, x: Union[float, npt.NDArray[np.float64]]
+    ) -> Union[float, npt.NDArray[np.float64]]:
+        # x is the progress through a ramp, 0..1
+        if self.curve == 0:
+            return x
+        return (1 - np.exp(-self.curve * x)) / (1 - math.exp(-self.curve))
+
+    def _stage_params(self, stage: int) -> Tuple[float, float, float, float]:
+        # Returns start level, end level, ramp duration and stage length in samples
+        # Attack and decay include their end point, matching the original steppers
+        if stage == self.ATTACK:
+            dur = self.attack_duration * self._sample_rate
+            return 0.0, 1.0, dur, math.floor(dur) + 1 if dur > 0 else 0
+        if stage == self.DECAY:
+            dur = self.decay_duration * self._sample_rate
+            return 1.0, self.sustain_level, dur, math.floor(dur) + 1 if dur > 0 else 0
+        if stage == self.RELEASE:
+            dur = self.release_duration * self._sample_rate
+            length = math.ceil(dur) if dur > 0 and self._release_level > 0 else 0
+            return self._release_level, 0.0, dur, length
+        if stage == self.SUSTAIN:
+            return self.sustain_level, self.sustain_level, 1.0, math.inf
+        return 0.0, 0.0, 1.0, math.inf
+
+    def _next_stage(self) -> None:
+        self._t = 0
+        if self._stage == self.RELEASE:
+            self._stage = self.ENDED
+        elif self._stage is not None and self._stage < self.SUSTAIN:
+            self._stage += 1
+
+    def _start_release(self) -> None:
+        self._release_in = None
+        self._release_level = self.val
+        self._stage = self.RELEASE
+        self._t = 0
 
     def __iter__(self) -> "ADSREnvelope":
         self.val = 0.0
         self.ended = False
-        self._stepper = self.get_ads_stepper()
+        self._stage = self.ATTACK
+        self._t = 0
+        self._release_in = None
 
         return self
 
     def __next__(self) -> float:
-        if self._stepper is None:
+        if self._stage is None:
             raise StopIteration
 
-        self.val = next(self._stepper)
+        if self._release_in is not None:
+            if self._release_in == 0:
+                self._start_release()
+            else:
+                self._release_in -= 1
+
+        start, end, dur, length = self._stage_params(self._stage)
+        while self._t >= length:
+            self._next_stage()
+            start, end, dur, length = self._stage_params(self._stage)
+
+        if self._stage == self.ENDED:
+            self.ended = True
+        self.val = start + (end - start) * self._shape(self._t / dur)
+        self._t += 1
         return self.val
 
-    def trigger_release(self) -> None:
-        # Switch steppers
-        self._stepper = self.get_r_stepper()
+    def _fill(self, out: npt.NDArray[np.float64], pos: int, stop: int) -> None:
+        # Write the envelope into out[pos:stop], moving through stages as each one runs out
+        while pos < stop:
+            start, end, dur, length = self._stage_params(self._stage)
+            if self._t >= length:
+                self._next_stage()
+                continue
+
+            m = int(min(stop - pos, length - self._t))
+            if start == end:
+                out[pos : pos + m] = start
+            else:
+                x = (self._t + np.arange(m)) / dur
+                out[pos : pos + m] = start + (end - start) * self._shape(x)
+
+            if self._stage == self.ENDED:
+                self.ended = True
+            self._t += m
+            pos += m
+            self.val = float(out[pos - 1])
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        if self._stage is None:
+            raise StopIteration
+
+        if jit.enabled():
+            return self._next_block_jit(n)
+
+        out = np.empty(n)
+        pos = 0
+        while pos < n:
+            if self._release_in == 0:
+                self._start_release()
+
+            stop = n
+            if self._release_in is not None:
+                stop = min(n, pos + self._release_in)
+                self._release_in -= stop - pos
+
+            self._fill(out, pos, stop)
+            pos = stop
+
+        return out
+
+    # Same samples as next_block, one compiled loop instead of a numpy call per stage
+    def _next_block_jit(self, n: int) -> npt.NDArray[np.float64]:
+        out = np.empty(n)
+        release_in = -1 if self._release_in is None else self._release_in
+        stage, self._t, release_in, self._release_level, self.val = kernels.adsr_block(
+            out,
+            self._stage,
+            self._t,
+            release_in,
+            self._release_level,
+            self.val,
+            self.attack_duration * self._sample_rate,
+            self.decay_duration * self._sample_rate,
+            self.sustain_level,
+            self.release_duration * self._sample_rate,
+            float(self.curve),
+        )
+        self._stage = stage
+        self._release_in = None if release_in < 0 else release_in
+        if stage == self.ENDED:
+            self.ended = True
+        return out
+
+    # The release starts offset samples into the next sample or block rendered
+    def trigger_release(self, offset: int = 0) -> None:
+        if offset > 0:
+            self._release_in = offset
+        else:
+            self._start_release()
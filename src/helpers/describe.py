@@ -0,0 +1,79 @@
+import hashlib
+import json
+import types
+from typing import Any, Callable, Dict
+import numpy as np
+
+# Canonical descriptions of generator graphs, plain JSON data that is equal for equal graphs
+# Every node describes the settings it starts from, not its current state,
+# so a description says what the node renders from the start
+
+
+def type_name(obj: Any) -> str:
+    cls = type(obj)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def describe_node(node: Any) -> Dict[str, Any]:
+    describe = getattr(node, "describe", None)
+    if describe is None:
+        raise TypeError(f"can't describe {type_name(node)}, it has no describe()")
+    return describe()
+
+
+# Callables are described by name and code, so editing a mod function changes its description
+# Closure values and defaults are part of it, globals they read are not
+def describe_callable(func: Callable[..., Any]) -> Dict[str, Any]:
+    code = getattr(func, "__code__", None)
+    if code is None:
+        raise TypeError(f"can't describe {func!r}, it has no code")
+    return {
+        "callable": f"{func.__module__}.{func.__qualname__}",
+        "code": _code_hash(code),
+        "defaults": describe_value(func.__defaults__ or ()),
+        "closure": [
+            describe_value(cell.cell_contents) for cell in func.__closure__ or ()
+        ],
+    }
+
+
+def _code_hash(code: types.CodeType) -> str:
+    h = hashlib.sha256(code.co_code)
+    for const in code.co_consts:
+        # Nested functions are code objects, their repr has an address in it
+        if isinstance(const, types.CodeType):
+            h.update(_code_hash(const).encode())
+        else:
+            h.update(repr(const).encode())
+    h.update(repr(code.co_names).encode())
+    return h.hexdigest()
+
+
+def describe_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (tuple, list)):
+        return [describe_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): describe_value(v) for k, v in value.items()}
+    if isinstance(value, np.ndarray):
+        return {
+            "array": hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest(),
+            "shape": list(value.shape),
+            "dtype": str(value.dtype),
+        }
+    if hasattr(value, "describe"):
+        return describe_node(value)
+    if callable(value):
+        return describe_callable(value)
+    raise TypeError(f"can't describe {type_name(value)}")
+
+
+# Content hash of a description, the same for equal descriptions in any process
+def digest(description: Any) -> str:
+    data = json.dumps(
+        describe_value(description), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
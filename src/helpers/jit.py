@@ -0,0 +1,54 @@
+import functools
+import os
+from typing import Any, Callable
+
+# Optional numba backend for the inner loops that can't be vectorised, e.g. anything recursive
+# Kernels are plain Python over numpy arrays, compiled to nopython code when numba is installed
+# Callers check enabled() and keep their numpy path as the fallback
+# Set AUDIOSYNTH_JIT=0 to turn the backend off even when numba is installed
+
+JIT_ENV = "AUDIOSYNTH_JIT"
+
+# numba is only imported the first time a kernel is needed, it's slow to import
+# None until then, False if it's missing or turned off
+_numba: Any = None
+
+
+def _load() -> Any:
+    global _numba
+    if _numba is None:
+        _numba = False
+        if os.environ.get(JIT_ENV, "1") != "0":
+            try:
+                import numba
+
+                _numba = numba
+            except ImportError:
+                pass
+    return _numba
+
+
+def enabled() -> bool:
+    return bool(_load())
+
+
+# Compiles on the first call, cache=True keeps the machine code on disk
+# so later processes, e.g. render workers, load it instead of compiling again
+class Kernel:
+    def __init__(self, func: Callable[..., Any]) -> None:
+        functools.update_wrapper(self, func)
+        self.py_func = func
+        self._compiled = None
+
+    def __call__(self, *args: Any) -> Any:
+        if self._compiled is None:
+            numba = _load()
+            if numba:
+                self._compiled = numba.njit(cache=True, nogil=True)(self.py_func)
+            else:
+                self._compiled = self.py_func
+        return self._compiled(*args)
+
+
+def kernel(func: Callable[..., Any]) -> Kernel:
+    return Kernel(func)
@@ -0,0 +1,161 @@
+import math
+import numpy as np
+import numpy.typing as npt
+from src.helpers.jit import kernel
+
+# Sample by sample DSP loops, compiled by src.helpers.jit when numba is available
+# Each one matches the numpy path of the class that calls it
+
+
+# Phase position going into each sample for a per-sample step, e.g. an oscillator under FM
+# Returns the phase after the last sample
+@kernel
+def accumulate_phase(
+    start: float, step: npt.NDArray[np.float64], out: npt.NDArray[np.float64]
+) -> float:
+    acc = start
+    for k in range(step.shape[0]):
+        out[k] = acc
+        acc += step[k]
+    return acc
+
+
+# ADSREnvelope rendered into out, stages are ADSREnvelope.ATTACK..ENDED
+# Durations are in samples, release_in is -1 when no release is scheduled
+# Returns the new stage, samples into the stage, release_in, release level and last value
+@kernel
+def adsr_block(
+    out: npt.NDArray[np.float64],
+    stage: int,
+    t: int,
+    release_in: int,
+    release_level: float,
+    val: float,
+    attack: float,
+    decay: float,
+    sustain: float,
+    release: float,
+    curve: float,
+):
+    norm = 1 - math.exp(-curve) if curve != 0 else 1.0
+
+    for k in range(out.shape[0]):
+        if release_in == 0:
+            release_in = -1
+            release_level = val
+            stage = 3
+            t = 0
+        elif release_in > 0:
+            release_in -= 1
+
+        # -1 marks a stage that holds until something else moves it on
+        while True:
+            if stage == 0:
+                start, end, dur = 0.0, 1.0, attack
+                length = math.floor(dur) + 1 if dur > 0 else 0
+            elif stage == 1:
+                start, end, dur = 1.0, sustain, decay
+                length = math.floor(dur) + 1 if dur > 0 else 0
+            elif stage == 3:
+                start, end, dur = release_level, 0.0, release
+                length = math.ceil(dur) if dur > 0 and release_level > 0 else 0
+            elif stage == 2:
+                start, end, dur = sustain, sustain, 1.0
+                length = -1
+            else:
+                start, end, dur = 0.0, 0.0, 1.0
+                length = -1
+
+            if length < 0 or t < length:
+                break
+            t = 0
+            stage = 4 if stage == 3 else stage + 1
+
+        # Held levels skip the curve, it overflows once t runs far past dur
+        if start == end:
+            val = start
+        else:
+            x = t / dur
+            if curve != 0:
+                x = (1 - math.exp(-curve * x)) / norm
+            val = start + (end - start) * x
+        out[k] = val
+        t += 1
+
+    return stage, t, release_in, release_level, val
+
+
+# Biquad over x into out, both (n, channels), in transposed direct form II
+# coeffs rows are b0, b1, b2, a1, a2 normalised by a0, row 0 is used until sample first,
+# then the next row every period samples, state is (2, channels) and carries over between calls
+@kernel
+def biquad_block(
+    x: npt.NDArray[np.float64],
+    out: npt.NDArray[np.float64],
+    coeffs: npt.NDArray[np.float64],
+    first: int,
+    period: int,
+    state: npt.NDArray[np.float64],
+) -> None:
+    for k in range(x.shape[0]):
+        row = 0 if k < first else 1 + (k - first) // period
+        b0 = coeffs[row, 0]
+        b1 = coeffs[row, 1]
+        b2 = coeffs[row, 2]
+        a1 = coeffs[row, 3]
+        a2 = coeffs[row, 4]
+        for c in range(x.shape[1]):
+            xin = x[k, c]
+            y = b0 * xin + state[0, c]
+            state[0, c] = b1 * xin - a1 * y + state[1, c]
+            state[1, c] = b2 * xin - a2 * y
+            out[k, c] = y
+
+
+# Multi-tap delay line over x into out, both (n, channels), buf is the (size, channels) circular buffer
+# delays is (n, taps) in samples, or (1, taps) when they don't change, each at least 1
+# The fb_tap tap is fed back into the line through a biquad when filtering, as in biquad_block
+# Returns the write position after the last sample
+@kernel
+def delay_block(
+    x: npt.NDArray[np.float64],
+    out: npt.NDArray[np.float64],
+    buf: npt.NDArray[np.float64],
+    pos: int,
+    delays: npt.NDArray[np.float64],
+    gains: npt.NDArray[np.float64],
+    feedback: float,
+    fb_tap: int,
+    filtering: bool,
+    coeffs: npt.NDArray[np.float64],
+    state: npt.NDArray[np.float64],
+    mix: float,
+) -> int:
+    size = buf.shape[0]
+    for k in range(x.shape[0]):
+        row = k if delays.shape[0] > 1 else 0
+        for c in range(x.shape[1]):
+            wet = 0.0
+            fb = 0.0
+            for i in range(gains.shape[0]):
+                # Linear interpolation between the two samples either side of the read position
+                read = pos - delays[row, i]
+                i0 = math.floor(read)
+                frac = read - i0
+                a = buf[i0 % size, c]
+                b = buf[(i0 + 1) % size, c]
+                val = a + (b - a) * frac
+                wet += gains[i] * val
+                if i == fb_tap:
+                    fb = val
+
+            if filtering:
+                y = coeffs[0] * fb + state[0, c]
+                state[0, c] = coeffs[1] * fb - coeffs[3] * y + state[1, c]
+                state[1, c] = coeffs[2] * fb - coeffs[4] * y
+                fb = y
+
+            buf[pos, c] = x[k, c] + feedback * fb
+            out[k, c] = x[k, c] * (1 - mix) + wet * mix
+        pos = (pos + 1) % size
+    return pos
@@ -1,7 +1,12 @@
 from dataclasses import dataclass
+from functools import lru_cache
 import math
 import random
-from src.helpers.vec3 import Vec3
+import re
+from typing import Iterable, Union
+import numpy as np
+import numpy.typing as npt
+from src.helpers.vec3 import Vec3, Vec3Array
 
 
 @dataclass
@@ -28,15 +33,22 @@ def random_int(min_range: int, max_range: int) -> int:
     return random.randint(min_range, max_range)
 
 
-def hash31(p: Vec3) -> float:
-    fract = Vec3(math.fmod(p[0], 1.0), math.fmod(p[1], 1.0), math.fmod(p[2], 1.0))
-    fract *= Vec3(0.1031, 0.11369, 0.13787)
-    res = math.fmod(Vec3.dot(fract, Vec3(1.0, 1.0, 1.0)), 19.19)
+# Hash of a point to -1..1, p is scaled before its fractional part is taken,
+# so whole numbers such as sample indices hash to unrelated values
+# A Vec3Array is hashed a row at a time in one go, giving an (N,) array
+def hash31(p: Union[Vec3, Vec3Array]) -> Union[float, npt.NDArray[np.float64]]:
+    if isinstance(p, Vec3Array):
+        return hash31_array(p.data)
+    fract = (p * Vec3(0.1031, 0.11369, 0.13787)).fract()
+    shifted = Vec3(fract[1], fract[2], fract[0]) + Vec3(19.19, 19.19, 19.19)
+    res = Vec3.dot(fract, shifted)
     fract += Vec3(res, res, res)
     return -1.0 + 2.0 * math.fmod((fract[0] + fract[1]) * fract[2], 1.0)
 
 
-def hash33(p3: Vec3) -> Vec3:
+def hash33(p3: Union[Vec3, Vec3Array]) -> Union[Vec3, Vec3Array]:
+    if isinstance(p3, Vec3Array):
+        return Vec3Array(hash33_array(p3.data))
     p = p3 * Vec3(0.1031, 0.11369, 0.13787)
     p = p.fract()
     dot_prod = Vec3.dot(p, Vec3(p[1], p[0], p[2]) + Vec3(19.19, 19.19, 19.19))
@@ -48,6 +60,30 @@ def hash33(p3: Vec3) -> Vec3:
     )
 
 
+_HASH_SCALE = np.array([0.1031, 0.11369, 0.13787])
+
+
+# hash31 and hash33 over arrays of points, shaped (..., 3), giving the same values as the scalar versions
+def hash31_array(p: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    fract = np.fmod(p * _HASH_SCALE, 1.0)
+    x, y, z = fract[..., 0], fract[..., 1], fract[..., 2]
+    res = x * (y + 19.19) + y * (z + 19.19) + z * (x + 19.19)
+    x, y, z = x + res, y + res, z + res
+    return -1.0 + 2.0 * np.fmod((x + y) * z, 1.0)
+
+
+def hash33_array(p3: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    p = np.fmod(p3 * _HASH_SCALE, 1.0)
+    x, y, z = p[..., 0], p[..., 1], p[..., 2]
+    dot_prod = x * (y + 19.19) + y * (x + 19.19) + z * (z + 19.19)
+    x, y, z = x + dot_prod, y + dot_prod, z + dot_prod
+    out = np.empty(p.shape)
+    out[..., 0] = (x + y) * z
+    out[..., 1] = (x + z) * y
+    out[..., 2] = (y + z) * x
+    return -1.0 + 2.0 * np.fmod(out, 1.0)
+
+
 def clamp(x: float, a_min: float, a_max: float) -> float:
     return max(a_min, min(a_max, x))
 
@@ -56,6 +92,40 @@ def freq_to_vel(hz: float) -> float:
     return hz * 2.0 * Constants.PI
 
 
+def midi_to_hz(note: int) -> float:
+    return 440.0 * math.pow(2.0, (note - 69) / 12)
+
+
+_NOTE_RE = re.compile(r"^\s*([A-Ga-g])([#b\u266f\u266d!]*)(-?\d+)?([+-]\d+)?\s*$")
+_PITCH_CLASSES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+_ACCIDENTALS = {"#": 1, "\u266f": 1, "b": -1, "\u266d": -1, "!": -1}
+
+
+# Note names follow librosa, e.g. "A4", "C#3", "Eb2", "G5+25" (cents), octave defaults to 0
+@lru_cache(maxsize=None)
+def note_to_midi(note: str) -> float:
+    match = _NOTE_RE.match(note)
+    if match is None:
+        raise ValueError(f"improper note format: '{note}'")
+
+    letter, accidentals, octave, cents = match.groups()
+    pitch = _PITCH_CLASSES[letter.upper()] + sum(_ACCIDENTALS[a] for a in accidentals)
+    midi = 12 * (int(octave or 0) + 1) + pitch
+    return midi + int(cents or 0) / 100
+
+
+# Same results as librosa.note_to_hz without importing librosa
+# A single name gives a float, a sequence of names gives an array
+def note_to_hz(
+    note: Union[str, Iterable[str]],
+) -> Union[np.float64, npt.NDArray[np.float64]]:
+    if isinstance(note, str):
+        return np.float64(440.0 * 2.0 ** ((note_to_midi(note) - 69) / 12))
+
+    midi = np.fromiter((note_to_midi(n) for n in note), dtype=np.float64)
+    return 440.0 * 2.0 ** ((midi - 69) / 12)
+
+
 def scale(note_id: int, scale_id: int = Constants.SCALE_DEFAULT):
     if scale_id == Constants.SCALE_DEFAULT:
         return 256 * math.pow(1.0594630943592952645618252949463, note_id)
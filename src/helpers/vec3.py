@@ -1,80 +1,126 @@
 from __future__ import annotations
 import math
 import random
-from typing import List, Union
+from typing import Iterable, Iterator, List, Tuple, Union
+import numpy as np
+import numpy.typing as npt
 
 
+# Components are plain attributes, with __slots__ a Vec3 has no per instance dict
 class Vec3:
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0):
-        self.e: List[float] = [x, y, z]
+        self.x = x
+        self.y = y
+        self.z = z
+
+    # Components as a list, kept for code that reads or replaces them all at once
+    @property
+    def e(self) -> List[float]:
+        return [self.x, self.y, self.z]
+
+    @e.setter
+    def e(self, value: List[float]) -> None:
+        self.x, self.y, self.z = value
 
     def __getitem__(self, i: int):
-        return self.e[i]
+        if i == 0 or i == -3:
+            return self.x
+        if i == 1 or i == -2:
+            return self.y
+        if i == 2 or i == -1:
+            return self.z
+        raise IndexError("Vec3 index out of range")
 
     def __setitem__(self, i: int, value: float):
-        self.e[i] = value
+        if i == 0 or i == -3:
+            self.x = value
+        elif i == 1 or i == -2:
+            self.y = value
+        elif i == 2 or i == -1:
+            self.z = value
+        else:
+            raise IndexError("Vec3 index out of range")
+
+    def __iter__(self) -> Iterator[float]:
+        return iter((self.x, self.y, self.z))
 
+    def __repr__(self) -> str:
+        return f"Vec3({self.x}, {self.y}, {self.z})"
+
+    # Operations with a Vec3Array are left to the array, which returns an array
     def __add__(self, other: Vec3) -> Vec3:
-        return Vec3(self[0] + other[0], self[1] + other[1], self[2] + other[2])
+        if isinstance(other, Vec3Array):
+            return NotImplemented
+        return Vec3(self.x + other.x, self.y + other.y, self.z + other.z)
 
     def __sub__(self, other: Vec3) -> Vec3:
-        return Vec3(self[0] - other[0], self[1] - other[1], self[2] - other[2])
+        if isinstance(other, Vec3Array):
+            return NotImplemented
+        return Vec3(self.x - other.x, self.y - other.y, self.z - other.z)
 
     def __mul__(self, other: Union[Vec3, float]) -> Vec3:
         if isinstance(other, Vec3):
-            return Vec3(self[0] * other[0], self[1] * other[1], self[2] * other[2])
-        return Vec3(self[0] * other, self[1] * other, self[2] * other)
+            return Vec3(self.x * other.x, self.y * other.y, self.z * other.z)
+        if isinstance(other, Vec3Array):
+            return NotImplemented
+        return Vec3(self.x * other, self.y * other, self.z * other)
 
     def __rmul__(self, other: Union[Vec3, float]) -> Vec3:
         return self * other
 
     def __truediv__(self, other: Union[Vec3, float]) -> Vec3:
         if isinstance(other, Vec3):
-            return Vec3(self[0] / other[0], self[1] / other[1], self[2] / other[2])
-        return Vec3(self[0] / other, self[1] / other, self[2] / other)
+            return Vec3(self.x / other.x, self.y / other.y, self.z / other.z)
+        if isinstance(other, Vec3Array):
+            return NotImplemented
+        return Vec3(self.x / other, self.y / other, self.z / other)
 
     def __neg__(self):
-        return Vec3(-self[0], -self[1], -self[2])
+        return Vec3(-self.x, -self.y, -self.z)
 
     def length(self):
         return math.sqrt(self.length_squared())
 
     def length_squared(self):
-        return self[0] ** 2 + self[1] ** 2 + self[2] ** 2
+        return self.x * self.x + self.y * self.y + self.z * self.z
 
     def make_unit_vec(self):
         k = 1.0 / self.length()
-        self.e = [self[0] * k, self[1] * k, self[2] * k]
+        self.x *= k
+        self.y *= k
+        self.z *= k
 
     def near_zero(self):
         s = 1e-8
-        return abs(self[0]) < s and abs(self[1]) < s and abs(self[2]) < s
+        return abs(self.x) < s and abs(self.y) < s and abs(self.z) < s
 
     def fract(self):
         return Vec3(
-            math.fmod(self[0], 1.0), math.fmod(self[1], 1.0), math.fmod(self[2], 1.0)
+            math.fmod(self.x, 1.0), math.fmod(self.y, 1.0), math.fmod(self.z, 1.0)
         )
 
     def floor(self):
-        return Vec3(math.floor(self[0]), math.floor(self[1]), math.floor(self[2]))
+        return Vec3(math.floor(self.x), math.floor(self.y), math.floor(self.z))
 
     def mod(self, other: Vec3, scale: Vec3):
         return Vec3(
-            math.fmod(self[0] + other[0], scale[0]),
-            math.fmod(self[1] + other[1], scale[1]),
-            math.fmod(self[2] + other[2], scale[2]),
+            math.fmod(self.x + other.x, scale.x),
+            math.fmod(self.y + other.y, scale.y),
+            math.fmod(self.z + other.z, scale.z),
         )
 
     @staticmethod
     def dot(v1: Vec3, v2: Vec3):
-        return v1[0] * v2[0] + v1[1] * v2[1] + v1[2] * v2[2]
+        return v1.x * v2.x + v1.y * v2.y + v1.z * v2.z
 
     @staticmethod
     def cross(v1: Vec3, v2: Vec3):
         return Vec3(
-            v1[1] * v2[2] - v1[2] * v2[1],
-            -(v1[0] * v2[2] - v1[2] * v2[0]),
-            v1[0] * v2[1] - v1[1] * v2[0],
+            v1.y * v2.z - v1.z * v2.y,
+            -(v1.x * v2.z - v1.z * v2.x),
+            v1.x * v2.y - v1.y * v2.x,
         )
 
     @staticmethod
@@ -112,3 +158,176 @@ class Vec3:
     @staticmethod
     def mix(a: Vec3, b: Vec3, t: float):
         return a * (1.0 - t) + b * t
+
+
+Vec3Like = Union[Vec3, "Vec3Array"]
+ArrayOrFloat = Union[float, npt.NDArray[np.float64]]
+
+
+# Components of a Vec3 or Vec3Array as an array, (3,) or (N, 3), ready to broadcast
+def _components(
+    v: Union[Vec3Like, ArrayOrFloat],
+) -> Union[npt.NDArray[np.float64], float]:
+    if isinstance(v, Vec3Array):
+        return v.data
+    if isinstance(v, Vec3):
+        return np.array((v.x, v.y, v.z))
+    if isinstance(v, np.ndarray) and v.ndim == 1:
+        # One value per vector, e.g. a scale from dot()
+        return v[:, None]
+    return v
+
+
+# A batch of N vectors as one (N, 3) array, with the operations of Vec3 applied to every row
+# Results that are a number per vector, e.g. dot() and length(), are (N,) arrays
+# Operands can be another Vec3Array, a single Vec3 applied to every row, (N,) arrays or numbers
+class Vec3Array:
+    __slots__ = ("data",)
+    # numpy arrays on the left of an operator defer to Vec3Array instead of looping over it
+    __array_ufunc__ = None
+
+    def __init__(self, data: npt.ArrayLike) -> None:
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim != 2 or data.shape[1] != 3:
+            raise ValueError(f"Vec3Array needs an (N, 3) array, got {data.shape}")
+        self.data: npt.NDArray[np.float64] = data
+
+    @classmethod
+    def from_vecs(cls, vecs: Iterable[Vec3]) -> Vec3Array:
+        return cls(np.array([tuple(v) for v in vecs], dtype=np.float64).reshape(-1, 3))
+
+    @classmethod
+    def from_components(
+        cls, x: ArrayOrFloat, y: ArrayOrFloat, z: ArrayOrFloat
+    ) -> Vec3Array:
+        x, y, z = np.broadcast_arrays(
+            np.asarray(x, dtype=np.float64),
+            np.asarray(y, dtype=np.float64),
+            np.asarray(z, dtype=np.float64),
+        )
+        return cls(np.stack((x.ravel(), y.ravel(), z.ravel()), axis=1))
+
+    @property
+    def x(self) -> npt.NDArray[np.float64]:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> npt.NDArray[np.float64]:
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> npt.NDArray[np.float64]:
+        return self.data[:, 2]
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # An int gives that row as a Vec3, slices and masks give a Vec3Array
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return Vec3(*(float(c) for c in self.data[i]))
+        return Vec3Array(self.data[i])
+
+    def __setitem__(self, i, value: Vec3Like) -> None:
+        self.data[i] = _components(value)
+
+    def __iter__(self) -> Iterator[Vec3]:
+        return (Vec3(float(x), float(y), float(z)) for x, y, z in self.data)
+
+    def __repr__(self) -> str:
+        return f"Vec3Array({self.data!r})"
+
+    def __add__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(self.data + _components(other))
+
+    def __radd__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(_components(other) + self.data)
+
+    def __sub__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(self.data - _components(other))
+
+    def __rsub__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(_components(other) - self.data)
+
+    def __mul__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(self.data * _components(other))
+
+    def __rmul__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(_components(other) * self.data)
+
+    def __truediv__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(self.data / _components(other))
+
+    def __rtruediv__(self, other: Union[Vec3Like, ArrayOrFloat]) -> Vec3Array:
+        return Vec3Array(_components(other) / self.data)
+
+    def __neg__(self) -> Vec3Array:
+        return Vec3Array(-self.data)
+
+    def length(self) -> npt.NDArray[np.float64]:
+        return np.sqrt(self.length_squared())
+
+    def length_squared(self) -> npt.NDArray[np.float64]:
+        return np.einsum("ij,ij->i", self.data, self.data)
+
+    def make_unit_vec(self) -> None:
+        self.data /= self.length()[:, None]
+
+    def near_zero(self) -> npt.NDArray[np.bool_]:
+        return np.all(np.abs(self.data) < 1e-8, axis=1)
+
+    # Same as Vec3.fract, the sign follows the component as with math.fmod
+    def fract(self) -> Vec3Array:
+        return Vec3Array(np.fmod(self.data, 1.0))
+
+    def floor(self) -> Vec3Array:
+        return Vec3Array(np.floor(self.data))
+
+    def mod(self, other: Vec3Like, scale: Vec3Like) -> Vec3Array:
+        return Vec3Array(np.fmod(self.data + _components(other), _components(scale)))
+
+    @staticmethod
+    def dot(v1: Vec3Like, v2: Vec3Like) -> npt.NDArray[np.float64]:
+        return np.sum(_components(v1) * _components(v2), axis=-1)
+
+    @staticmethod
+    def cross(v1: Vec3Like, v2: Vec3Like) -> Vec3Array:
+        a, b = np.broadcast_arrays(_components(v1), _components(v2))
+        return Vec3Array(np.cross(a, b).reshape(-1, 3))
+
+    @staticmethod
+    def unit_vector(v: Vec3Array) -> Vec3Array:
+        return v / v.length()
+
+    @staticmethod
+    def reflect(v: Vec3Like, n: Vec3Like) -> Vec3Array:
+        return Vec3Array.from_array(
+            _components(v) - 2 * Vec3Array.dot(v, n)[..., None] * _components(n)
+        )
+
+    # Refracted directions, with a mask of the rows that refract rather than reflect totally
+    # Rows that don't refract are left as zero vectors
+    @staticmethod
+    def refract(
+        v: Vec3Array, n: Vec3Like, ior: float
+    ) -> Tuple[npt.NDArray[np.bool_], Vec3Array]:
+        uv = Vec3Array.unit_vector(v)
+        dt = Vec3Array.dot(uv, n)
+        discriminant = 1.0 - ior * ior * (1 - dt * dt)
+        refracts = discriminant > 0
+        root = np.sqrt(np.where(refracts, discriminant, 0.0))
+        nc = _components(n)
+        out = ior * (uv.data - nc * dt[:, None]) - nc * root[:, None]
+        out[~refracts] = 0.0
+        return refracts, Vec3Array(out)
+
+    # t can be a number or one value per row
+    @staticmethod
+    def mix(a: Vec3Like, b: Vec3Like, t: ArrayOrFloat) -> Vec3Array:
+        t = _components(t)
+        return Vec3Array.from_array(_components(a) * (1.0 - t) + _components(b) * t)
+
+    # Wraps a result that may be (3,) when every operand was a single Vec3
+    @staticmethod
+    def from_array(data: npt.NDArray[np.float64]) -> Vec3Array:
+        return Vec3Array(np.asarray(data, dtype=np.float64).reshape(-1, 3))
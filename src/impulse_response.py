@@ -0,0 +1,145 @@
+from collections import OrderedDict
+import hashlib
+import math
+import os
+import threading
+from typing import Callable, Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+# An impulse response split into uniform partitions for partitioned convolution
+# The first partition stays in the time domain, it's convolved directly so the reverb adds no latency
+# The rest are kept as spectra of 2 * partition_size point FFTs, shaped (bins, channels, partitions)
+# so each bin is one dot product, in reverse order so the newest input spectrum meets the second partition
+# Arrays are read only, one ImpulseResponse is shared by every reverb using it
+class ImpulseResponse:
+    def __init__(self, ir: npt.NDArray[np.float64], partition_size: int = 512) -> None:
+        ir = np.asarray(ir, dtype=np.float64)
+        if ir.ndim == 1:
+            ir = ir[:, None]
+        if ir.ndim != 2 or ir.shape[1] not in (1, 2) or len(ir) == 0:
+            raise ValueError("impulse response must be mono or stereo (Nx2 array)")
+
+        self.partition_size = partition_size
+        self.length = len(ir)
+        self.channels = ir.shape[1]
+
+        partitions = max(1, math.ceil(len(ir) / partition_size))
+        padded = np.zeros((partitions * partition_size, self.channels))
+        padded[: len(ir)] = ir
+        parts = padded.reshape(partitions, partition_size, self.channels)
+
+        self.head: npt.NDArray[np.float64] = parts[0].copy()
+        spectra = np.fft.rfft(parts[:0:-1], n=2 * partition_size, axis=1)
+        self.spectra: npt.NDArray[np.complex128] = np.ascontiguousarray(
+            spectra.transpose(1, 2, 0)
+        )
+        self.head.flags.writeable = False
+        self.spectra.flags.writeable = False
+
+    # Partitions after the first
+    @property
+    def partitions(self) -> int:
+        return self.spectra.shape[2]
+
+    @property
+    def nbytes(self) -> int:
+        return self.head.nbytes + self.spectra.nbytes
+
+
+# Process wide cache of partitioned impulse responses, keyed by where they came from
+# The least recently used are dropped once the cache goes over max_bytes
+class ImpulseResponseCache:
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._irs: "OrderedDict[Tuple, ImpulseResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, build: Callable[[], ImpulseResponse]) -> ImpulseResponse:
+        with self._lock:
+            if key in self._irs:
+                self._irs.move_to_end(key)
+                return self._irs[key]
+
+        ir = build()
+        with self._lock:
+            if key not in self._irs:
+                self._irs[key] = ir
+                self.nbytes += ir.nbytes
+            # Never evict the response just asked for, even if it alone is over the limit
+            while self.nbytes > self.max_bytes and len(self._irs) > 1:
+                _, evicted = self._irs.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            return self._irs[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._irs.clear()
+            self.nbytes = 0
+
+
+ir_cache = ImpulseResponseCache()
+
+
+# Scales an impulse response to unit energy, so different rooms come out at a similar level
+def _normalized(ir: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    energy = math.sqrt(float(np.sum(ir**2)))
+    return ir / energy if energy > 0 else ir
+
+
+def impulse_response(
+    ir: npt.NDArray[np.float64], partition_size: int = 512, normalize: bool = True
+) -> ImpulseResponse:
+    ir = np.asarray(ir, dtype=np.float64)
+    key = (
+        "array",
+        hashlib.sha256(np.ascontiguousarray(ir).tobytes()).hexdigest(),
+        ir.shape,
+        partition_size,
+        normalize,
+    )
+    return ir_cache.get(
+        key,
+        lambda: ImpulseResponse(_normalized(ir) if normalize else ir, partition_size),
+    )
+
+
+def read_wav(path: str) -> Tuple[int, npt.NDArray[np.float64]]:
+    # Imported here so the reverb doesn't pay for scipy until an impulse response is loaded
+    from scipy.io import wavfile
+
+    rate, data = wavfile.read(path)
+    if data.dtype.kind == "i":
+        data = data / float(np.iinfo(data.dtype).max)
+    elif data.dtype.kind == "u":
+        data = (data - 128) / 128.0
+    data = np.asarray(data, dtype=np.float64)
+    # Only the first two channels of a multichannel response are used
+    if data.ndim == 2:
+        data = data[:, :2]
+    return rate, data
+
+
+# Loads a WAV impulse response, resampled to sample_rate if it was recorded at another rate
+# Cached by path and modification time, so every reverb using the file shares its spectra
+def load_impulse_response(
+    path: str,
+    sample_rate: int = 44100,
+    partition_size: int = 512,
+    normalize: bool = True,
+) -> ImpulseResponse:
+    path = os.path.abspath(path)
+    key = ("file", path, os.path.getmtime(path), sample_rate, partition_size, normalize)
+
+    def build() -> ImpulseResponse:
+        rate, ir = read_wav(path)
+        if rate != sample_rate:
+            from scipy.signal import resample_poly
+
+            common = math.gcd(rate, sample_rate)
+            ir = resample_poly(ir, sample_rate // common, rate // common, axis=0)
+        return ImpulseResponse(_normalized(ir) if normalize else ir, partition_size)
+
+    return ir_cache.get(key, build)
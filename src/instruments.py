@@ -0,0 +1,72 @@
+from typing import Any, Dict
+from src.envelopes import ADSREnvelope
+from src.modulator import ModulatedOscillator, array_mod
+from src.oscillators.oscillators import (
+    SineOscillator,
+    TriangleOscillator,
+    SquareOscillator,
+    SawtoothOscillator,
+)
+from src.voice_pool import Patch
+
+
+# Built-in patches, each builds one voice tuned to 440Hz for VoicePool to retune
+# They live at module level so worker processes can look them up by name
+# sample_rate is what the voice renders at, e.g. functools.partial(sine_keys, 48000)
+
+
+@array_mod
+def amp_mod(init_amp: float, env: float) -> float:
+    return env * init_amp
+
+
+def sine_keys(sample_rate: int = 44100) -> Any:
+    return ModulatedOscillator(
+        SineOscillator(sample_rate=sample_rate),
+        ADSREnvelope(0.01, 0.3, 0.5, 0.3, sample_rate),
+        amp_mod=amp_mod,
+    )
+
+
+def square_bass(sample_rate: int = 44100) -> Any:
+    return ModulatedOscillator(
+        SquareOscillator(amp=0.6, sample_rate=sample_rate),
+        ADSREnvelope(0.005, 0.2, 0.6, 0.1, sample_rate),
+        amp_mod=amp_mod,
+    )
+
+
+def saw_lead(sample_rate: int = 44100) -> Any:
+    return ModulatedOscillator(
+        SawtoothOscillator(amp=0.6, sample_rate=sample_rate),
+        ADSREnvelope(0.01, 0.1, 0.7, 0.2, sample_rate),
+        amp_mod=amp_mod,
+    )
+
+
+def triangle_pad(sample_rate: int = 44100) -> Any:
+    return ModulatedOscillator(
+        TriangleOscillator(sample_rate=sample_rate),
+        ADSREnvelope(0.3, 0.5, 0.7, 0.8, sample_rate),
+        amp_mod=amp_mod,
+    )
+
+
+PATCHES: Dict[str, Patch] = {
+    "sine_keys": sine_keys,
+    "square_bass": square_bass,
+    "saw_lead": saw_lead,
+    "triangle_pad": triangle_pad,
+}
+
+
+# Picks a patch from the General MIDI family of a program number
+def patch_for_program(program: int) -> str:
+    family = program // 8
+    if family == 4:
+        return "square_bass"
+    if family == 10:
+        return "saw_lead"
+    if family == 11:
+        return "triangle_pad"
+    return "sine_keys"
@@ -0,0 +1,133 @@
+from dataclasses import dataclass, field
+import bisect
+import struct
+from typing import BinaryIO, List, Tuple
+from src.midi_input import MidiEvent
+
+_DEFAULT_TEMPO = 500000
+
+
+@dataclass
+class MidiTrack:
+    name: str = ""
+    # Program of the first program change in the track
+    program: int = 0
+    # (tick, event) pairs in tick order
+    events: List[Tuple[int, MidiEvent]] = field(default_factory=list)
+
+
+# A parsed Standard MIDI File, format 0 and 1 with ticks per beat timing
+@dataclass
+class MidiFile:
+    ticks_per_beat: int
+    tracks: List[MidiTrack]
+    # (tick, microseconds per beat) tempo changes in tick order
+    tempos: List[Tuple[int, int]] = field(default_factory=list)
+
+    def tick_to_seconds(self, tick: int) -> float:
+        seconds = 0.0
+        last_tick, tempo = 0, _DEFAULT_TEMPO
+        for change_tick, change_tempo in self.tempos:
+            if change_tick >= tick:
+                break
+            seconds += (change_tick - last_tick) * tempo / 1e6 / self.ticks_per_beat
+            last_tick, tempo = change_tick, change_tempo
+        return seconds + (tick - last_tick) * tempo / 1e6 / self.ticks_per_beat
+
+    # Events of one track with their timestamp in ms and the sample they land on
+    def track_events(self, index: int, sample_rate: int = 44100) -> List[MidiEvent]:
+        events = []
+        for tick, event in self.tracks[index].events:
+            seconds = self.tick_to_seconds(tick)
+            events.append(
+                MidiEvent(
+                    event.kind,
+                    event.channel,
+                    event.data1,
+                    event.data2,
+                    timestamp=seconds * 1000,
+                    sample=round(seconds * sample_rate),
+                )
+            )
+        return events
+
+
+def _read_vlq(data: bytes, pos: int) -> Tuple[int, int]:
+    val = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        val = (val << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return val, pos
+
+
+def _parse_track(data: bytes, tempos: List[Tuple[int, int]]) -> MidiTrack:
+    track = MidiTrack()
+    found_program = False
+    pos, tick, status = 0, 0, 0
+
+    while pos < len(data):
+        delta, pos = _read_vlq(data, pos)
+        tick += delta
+
+        if data[pos] >= 0x80:
+            status = data[pos]
+            pos += 1
+        elif status == 0:
+            raise ValueError("running status without a previous status byte")
+
+        if status == 0xFF:
+            meta_type = data[pos]
+            length, pos = _read_vlq(data, pos + 1)
+            payload = data[pos : pos + length]
+            pos += length
+            # Meta and sysex events cancel running status
+            status = 0
+            if meta_type == 0x51 and length == 3:
+                bisect.insort(tempos, (tick, int.from_bytes(payload, "big")))
+            elif meta_type == 0x03:
+                track.name = payload.decode("latin-1")
+            elif meta_type == 0x2F:
+                break
+        elif status in (0xF0, 0xF7):
+            length, pos = _read_vlq(data, pos)
+            pos += length
+            status = 0
+        elif status & 0xF0 in (0xC0, 0xD0):
+            if status & 0xF0 == 0xC0 and not found_program:
+                track.program = data[pos]
+                found_program = True
+            pos += 1
+        else:
+            event = MidiEvent.from_raw(((status, data[pos], data[pos + 1]), 0.0))
+            pos += 2
+            if event is not None:
+                track.events.append((tick, event))
+
+    return track
+
+
+def read_midi_file(f: BinaryIO) -> MidiFile:
+    data = f.read()
+    if data[:4] != b"MThd":
+        raise ValueError("not a Standard MIDI File")
+
+    header_len = struct.unpack(">I", data[4:8])[0]
+    _, ntracks, division = struct.unpack(">HHH", data[8:14])
+    if division & 0x8000:
+        raise ValueError("SMPTE timed MIDI files are not supported")
+
+    tracks: List[MidiTrack] = []
+    tempos: List[Tuple[int, int]] = []
+    pos = 8 + header_len
+    while pos + 8 <= len(data) and len(tracks) < ntracks:
+        chunk_type = data[pos : pos + 4]
+        length = struct.unpack(">I", data[pos + 4 : pos + 8])[0]
+        chunk = data[pos + 8 : pos + 8 + length]
+        pos += 8 + length
+        # Unknown chunks are skipped as the spec asks
+        if chunk_type == b"MTrk":
+            tracks.append(_parse_track(chunk, tempos))
+
+    return MidiFile(division, tracks, tempos)
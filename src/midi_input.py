@@ -0,0 +1,176 @@
+from dataclasses import dataclass
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+NOTE_OFF = "note_off"
+NOTE_ON = "note_on"
+CONTROL_CHANGE = "control_change"
+
+# Raw events as read from pygame.midi: ([status, data1, data2, data3], timestamp in ms)
+RawEvent = Tuple[Sequence[int], float]
+
+
+@dataclass
+class MidiEvent:
+    kind: str
+    channel: int
+    # Note number or controller number
+    data1: int
+    # Velocity or controller value
+    data2: int
+    # Device timestamp in ms
+    timestamp: float = 0.0
+    # Audio sample the event should land on, None plays it at the start of the next block
+    sample: Optional[int] = None
+
+    @staticmethod
+    def from_raw(raw: RawEvent) -> Optional["MidiEvent"]:
+        data, timestamp = raw
+        status, data1, data2 = data[0], data[1], data[2]
+        kind = status & 0xF0
+
+        if kind == 0x90 and data2 > 0:
+            return MidiEvent(NOTE_ON, status & 0x0F, data1, data2, timestamp)
+        if kind == 0x80 or kind == 0x90:
+            return MidiEvent(NOTE_OFF, status & 0x0F, data1, data2, timestamp)
+        if kind == 0xB0:
+            return MidiEvent(CONTROL_CHANGE, status & 0x0F, data1, data2, timestamp)
+        return None
+
+
+# A MIDI source is polled for raw events, time() is the device clock the timestamps use
+class MidiSource:
+    def poll(self) -> bool:
+        return False
+
+    def read(self, max_events: int) -> List[RawEvent]:
+        return []
+
+    def time(self) -> float:
+        return 0.0
+
+    def close(self) -> None:
+        pass
+
+
+class PygameMidiSource(MidiSource):
+    def __init__(self, device_id: Optional[int] = None) -> None:
+        import pygame.midi
+
+        self._midi = pygame.midi
+        self._midi.init()
+        if device_id is None:
+            device_id = self._midi.get_default_input_id()
+        self._input = self._midi.Input(device_id=device_id)
+
+    def poll(self) -> bool:
+        return bool(self._input.poll())
+
+    def read(self, max_events: int) -> List[RawEvent]:
+        return self._input.read(max_events)
+
+    def time(self) -> float:
+        return float(self._midi.time())
+
+    def close(self) -> None:
+        self._input.close()
+        self._midi.quit()
+
+
+# Plays back a scripted list of raw events once the clock passes their timestamps
+# The clock defaults to ms since the source was made, tests can pass their own
+class FakeMidiSource(MidiSource):
+    def __init__(
+        self,
+        events: Sequence[RawEvent],
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None:
+        self._events = sorted(events, key=lambda raw: raw[1])
+        start = time.perf_counter()
+        self._clock = clock or (lambda: (time.perf_counter() - start) * 1000)
+
+    def poll(self) -> bool:
+        return bool(self._events) and self._events[0][1] <= self._clock()
+
+    def read(self, max_events: int) -> List[RawEvent]:
+        now = self._clock()
+        read: List[RawEvent] = []
+        while self._events and len(read) < max_events and self._events[0][1] <= now:
+            read.append(self._events.pop(0))
+        return read
+
+    def time(self) -> float:
+        return self._clock()
+
+
+# Reads a MIDI source on its own thread and schedules events into the audio engine
+# Device timestamps are mapped onto the audio sample clock, plus a fixed latency so
+# events always land in a block that hasn't been rendered yet
+class MidiInput:
+    def __init__(
+        self,
+        source: MidiSource,
+        target: Any,
+        sample_rate: int = 44100,
+        latency: int = 512,
+        poll_interval: float = 0.001,
+        audio_clock: Optional[Callable[[], int]] = None,
+    ) -> None:
+        self.source = source
+        # Anything with schedule(event), e.g. VoicePool
+        self.target = target
+        self.sample_rate = sample_rate
+        self.latency = latency
+        self.poll_interval = poll_interval
+        self.audio_clock = audio_clock or (lambda: getattr(target, "sample_time", 0))
+        self.received = 0
+
+        self._origin: Tuple[float, int] = (0.0, 0)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Pins the device clock to the audio clock, timestamps are measured from this point
+    def sync(self) -> None:
+        self._origin = (self.source.time(), self.audio_clock())
+
+    def to_sample(self, timestamp: float) -> int:
+        origin_ms, origin_sample = self._origin
+        elapsed = (timestamp - origin_ms) * self.sample_rate / 1000
+        return origin_sample + round(elapsed) + self.latency
+
+    # Reads whatever is waiting, returns the number of events scheduled
+    def poll_once(self, max_events: int = 16) -> int:
+        if not self.source.poll():
+            return 0
+
+        count = 0
+        for raw in self.source.read(max_events):
+            event = MidiEvent.from_raw(raw)
+            if event is None:
+                continue
+            event.sample = self.to_sample(event.timestamp)
+            self.target.schedule(event)
+            count += 1
+
+        self.received += count
+        return count
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Only sleep when the source is idle, so bursts are drained straight away
+            if self.poll_once() == 0:
+                self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        self.sync()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
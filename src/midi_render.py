@@ -0,0 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import time
+from typing import List, Optional
+import numpy as np
+import numpy.typing as npt
+from src.instruments import PATCHES, patch_for_program
+from src.midi_file import MidiFile
+from src.midi_input import MidiEvent
+from src.voice_pool import VoicePool
+
+
+# Everything a worker process needs to render one track, kept picklable
+@dataclass
+class TrackJob:
+    index: int
+    name: str
+    patch: str
+    events: List[MidiEvent]
+    frames: int
+    sample_rate: int = 44100
+    block_size: int = 512
+    voices: int = 16
+
+
+@dataclass
+class TrackResult:
+    index: int
+    name: str
+    stem: npt.NDArray[np.float64]
+    render_seconds: float
+    sample_rate: int = 44100
+
+    # Seconds of audio rendered per second of wall time
+    @property
+    def realtime_factor(self) -> float:
+        return (len(self.stem) / self.sample_rate) / max(self.render_seconds, 1e-9)
+
+
+# One job per track with notes, every stem is rendered to the same length
+# Events are timed and voices rendered at sample_rate
+# tail is how long to keep rendering after the last event so releases can ring out
+def plan_jobs(
+    midi: MidiFile,
+    sample_rate: int = 44100,
+    tail: float = 2.0,
+    block_size: int = 512,
+    voices: int = 16,
+) -> List[TrackJob]:
+    tracks = [
+        (i, track, midi.track_events(i, sample_rate))
+        for i, track in enumerate(midi.tracks)
+        if track.events
+    ]
+    last = max((events[-1].sample or 0 for _, _, events in tracks), default=0)
+    frames = last + int(tail * sample_rate)
+
+    return [
+        TrackJob(
+            i,
+            track.name,
+            patch_for_program(track.program),
+            events,
+            frames,
+            sample_rate,
+            block_size,
+            voices,
+        )
+        for i, track, events in tracks
+    ]
+
+
+def render_track(job: TrackJob) -> TrackResult:
+    start = time.perf_counter()
+
+    patch = partial(PATCHES[job.patch], job.sample_rate)
+    pool = iter(VoicePool(patch, job.voices, block_size=job.block_size))
+    for event in job.events:
+        pool.schedule(event)
+
+    shape = (job.frames,) if pool.channels == 1 else (job.frames, pool.channels)
+    stem = np.empty(shape)
+    for pos in range(0, job.frames, job.block_size):
+        n = min(job.block_size, job.frames - pos)
+        stem[pos : pos + n] = pool.next_block(n)
+
+    return TrackResult(
+        job.index, job.name, stem, time.perf_counter() - start, job.sample_rate
+    )
+
+
+# Tracks share no state, so parallel and serial renders are bit identical
+def render_tracks(
+    jobs: List[TrackJob], workers: Optional[int] = None
+) -> List[TrackResult]:
+    if workers == 1 or len(jobs) <= 1:
+        return [render_track(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(render_track, jobs))
+
+
+# Sums stems in track order, mono stems are spread to both channels if any stem is stereo
+def mixdown(stems: List[npt.NDArray[np.float64]]) -> npt.NDArray[np.float64]:
+    stereo = any(stem.ndim == 2 for stem in stems)
+    mix = np.zeros((len(stems[0]), 2) if stereo else len(stems[0]))
+    for stem in stems:
+        if stereo and stem.ndim == 1:
+            mix += stem[:, None]
+        else:
+            mix += stem
+    return mix
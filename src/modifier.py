@@ -1,15 +1,54 @@
-from typing import Tuple, Iterable
-from src.modulator import TriggerableFloatGenerator
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Iterable, Union
+import numpy as np
+import numpy.typing as npt
+from src.helpers import jit, kernels
+from src.helpers.describe import describe_node, describe_value, type_name
+from src.impulse_response import (
+    ImpulseResponse,
+    impulse_response,
+    load_impulse_response,
+)
+from src.modulator import (
+    ModFunc,
+    ModulatedOscillator,
+    TriggerableFloatGenerator,
+    pull_block,
+    run_slower,
+)
+from src.wave_chain import can_end
 
 
 # A modifier modifies the signal of a generator but doesn't generate its own signal
 class Modifier:
-    pass
+    # Channels of the modified signal, None keeps the channels of the input
+    channels: Optional[int] = None
+
+
+# Linear ramp over n samples ending on end, for a parameter that was start for the last block
+# e.g. a volume changed by a controller between blocks glides there instead of stepping
+def _ramp(start: float, end: float, n: int) -> npt.NDArray[np.float64]:
+    return start + (end - start) * (np.arange(1, n + 1) / n)
 
 
 class Panner(Modifier):
+    channels = 2
+
     def __init__(self, r: float = 0.5) -> None:
         self.r = r
+        # r as of the end of the last block, a new r is ramped to over the next block
+        self._applied_r = r
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": type_name(self), "r": self.r}
+
+    # A pan has no timing of its own, it works the same at any rate
+    def run_slower(self, period: int) -> None:
+        pass
+
+    def reset(self) -> None:
+        self._applied_r = self.r
 
     def __call__(self, val: float) -> Tuple[float, float]:
         # Return tuple value for l r channel
@@ -17,10 +56,43 @@ class Panner(Modifier):
         l: float = 2.0 - r
         return (l * val, r * val)
 
+    # Block version of __call__, r optionally gives a pan value per sample
+    # Without it, a change to r since the last block is ramped over this one
+    def apply_block(
+        self,
+        val: npt.NDArray[np.float64],
+        r: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        if r is None:
+            if self.r == self._applied_r:
+                r = self.r
+            else:
+                r = _ramp(self._applied_r, self.r, len(val))
+                self._applied_r = self.r
+        else:
+            self._applied_r = float(r[-1])
+
+        _r = r * 2.0
+        l = 2.0 - _r
+        if val.ndim == 2:
+            return np.column_stack((l * val[:, 0], _r * val[:, 1]))
+        return np.column_stack((l * val, _r * val))
+
 
 class Volume(Modifier):
     def __init__(self, amp: float = 1.0):
         self.amp = amp
+        # amp as of the end of the last block, a new amp is ramped to over the next block
+        self._applied_amp = amp
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": type_name(self), "amp": self.amp}
+
+    def run_slower(self, period: int) -> None:
+        pass
+
+    def reset(self) -> None:
+        self._applied_amp = self.amp
 
     def __call__(self, val: float):
         _val = None
@@ -31,6 +103,25 @@ class Volume(Modifier):
             _val = val * self.amp
         return _val
 
+    # Block version of __call__, amp optionally gives a volume per sample
+    # Without it, a change to amp since the last block is ramped over this one
+    def apply_block(
+        self,
+        val: npt.NDArray[np.float64],
+        amp: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        if amp is None:
+            if self.amp == self._applied_amp:
+                return val * self.amp
+            amp = _ramp(self._applied_amp, self.amp, len(val))
+            self._applied_amp = self.amp
+        else:
+            self._applied_amp = float(amp[-1])
+
+        if val.ndim == 2:
+            return val * amp[:, None]
+        return val * amp
+
 
 # Modulated modifier, a modifier produces its own signal but modifies a give signal too
 class ModulatedPanner(Panner):
@@ -38,6 +129,13 @@ class ModulatedPanner(Panner):
         super().__init__(r=0.0)
         self.modulator = modulator
 
+    # r follows the modulator, so only the modulator is described
+    def describe(self) -> Dict[str, Any]:
+        return {"type": type_name(self), "modulator": describe_node(self.modulator)}
+
+    def run_slower(self, period: int) -> None:
+        run_slower(self.modulator, period)
+
     def __iter__(self) -> "ModulatedPanner":
         iter(self.modulator)
         return self
@@ -46,12 +144,23 @@ class ModulatedPanner(Panner):
         self.r = (next(self.modulator) + 1) / 2
         return self.r
 
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        r = (pull_block(self.modulator, n) + 1) / 2
+        self.r = float(r[-1])
+        return r
+
 
 class ModulatedVolume(Volume):
     def __init__(self, modulator):
         super().__init__(0.0)
         self.modulator = modulator
 
+    def describe(self) -> Dict[str, Any]:
+        return {"type": type_name(self), "modulator": describe_node(self.modulator)}
+
+    def run_slower(self, period: int) -> None:
+        run_slower(self.modulator, period)
+
     def __iter__(self) -> "ModulatedVolume":
         iter(self.modulator)
         return self
@@ -60,9 +169,14 @@ class ModulatedVolume(Volume):
         self.amp = next(self.modulator)
         return self.amp
 
-    def trigger_release(self) -> None:
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        amp = pull_block(self.modulator, n)
+        self.amp = float(amp[-1])
+        return amp
+
+    def trigger_release(self, offset: int = 0) -> None:
         if isinstance(self.modulator, TriggerableFloatGenerator):
-            self.modulator.trigger_release()
+            self.modulator.trigger_release(offset)
 
     @property
     def ended(self):
@@ -70,3 +184,664 @@ class ModulatedVolume(Volume):
         if isinstance(self.modulator, TriggerableFloatGenerator):
             ended = self.modulator.ended
         return ended
+
+
+# Biquad low-pass, high-pass or band-pass filter, from the RBJ audio EQ cookbook
+# Coefficients are worked out again at control rate, every control_period samples,
+# and the filter state carries over between samples and blocks
+class Filter(Modifier):
+    LOWPASS, HIGHPASS, BANDPASS = "lowpass", "highpass", "bandpass"
+
+    def __init__(
+        self,
+        cutoff: float = 1000.0,
+        resonance: float = 0.707,
+        mode: str = "lowpass",
+        sample_rate: int = 44100,
+        control_period: int = 64,
+    ) -> None:
+        if mode not in (self.LOWPASS, self.HIGHPASS, self.BANDPASS):
+            raise ValueError(f"unknown filter mode '{mode}'")
+        if control_period < 1:
+            raise ValueError("control_period must be at least 1")
+
+        self.cutoff = cutoff
+        self.resonance = resonance
+        self.mode = mode
+        self._sample_rate = sample_rate
+        self.control_period = control_period
+
+        # Filter state per channel, and the output buffer blocks are written into
+        self._state: npt.NDArray[np.float64] = np.zeros((2, 1))
+        self._out: npt.NDArray[np.float64] = np.empty((0, 1))
+        self.reset()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "cutoff": self.cutoff,
+            "resonance": self.resonance,
+            "mode": self.mode,
+            "sample_rate": self._sample_rate,
+            "control_period": self.control_period,
+        }
+
+    # Cutoffs are worked out against the sample rate, so they hold their pitch at the slower rate
+    def run_slower(self, period: int) -> None:
+        self._sample_rate = self._sample_rate / period
+        self._coeffs = self._coefficients(self.cutoff, self.resonance)
+
+    # Back to silence, e.g. when a voice starts again
+    def reset(self) -> None:
+        self._state.fill(0.0)
+        # Samples into the current control period
+        self._k = 0
+        self._params = (self.cutoff, self.resonance, self.mode)
+        self._coeffs = self._coefficients(self.cutoff, self.resonance)
+
+    # b0, b1, b2, a1, a2 normalised by a0, with a row for every cutoff when given arrays
+    def _coefficients(
+        self,
+        cutoff: Union[float, npt.NDArray[np.float64]],
+        resonance: Union[float, npt.NDArray[np.float64]],
+    ) -> npt.NDArray[np.float64]:
+        # Kept inside (0, nyquist), the coefficients blow up at either end
+        f = np.clip(cutoff, 1.0, 0.49 * self._sample_rate)
+        q = np.maximum(resonance, 0.05)
+        w0 = 2 * math.pi * f / self._sample_rate
+        cos = np.cos(w0)
+        alpha = np.sin(w0) / (2 * q)
+
+        if self.mode == self.LOWPASS:
+            b0 = b2 = (1 - cos) / 2
+            b1 = 1 - cos
+        elif self.mode == self.HIGHPASS:
+            b0 = b2 = (1 + cos) / 2
+            b1 = -(1 + cos)
+        else:
+            b0 = alpha
+            b1 = np.zeros_like(cos)
+            b2 = -alpha
+
+        a0 = 1 + alpha
+        coeffs = np.stack((b0, b1, b2, -2 * cos, 1 - alpha), axis=-1)
+        return coeffs / np.expand_dims(a0, -1)
+
+    def _refresh(self) -> None:
+        params = (self.cutoff, self.resonance, self.mode)
+        if params != self._params:
+            self._params = params
+            self._coeffs = self._coefficients(self.cutoff, self.resonance)
+
+    def _channels(self, channels: int) -> None:
+        if self._state.shape[1] != channels:
+            self._state = np.zeros((2, channels))
+
+    def __call__(self, val: Union[float, Tuple[float, float]]):
+        if self._k == 0:
+            self._refresh()
+        self._k = (self._k + 1) % self.control_period
+
+        vals = tuple(val) if isinstance(val, Iterable) else (val,)
+        self._channels(len(vals))
+        b0, b1, b2, a1, a2 = self._coeffs
+        z = self._state
+        out = []
+        for c, x in enumerate(vals):
+            y = b0 * x + z[0, c]
+            z[0, c] = b1 * x - a1 * y + z[1, c]
+            z[1, c] = b2 * x - a2 * y
+            out.append(float(y))
+        return tuple(out) if isinstance(val, Iterable) else out[0]
+
+    # Block version of __call__, ctrl optionally gives the cutoff and resonance per sample as (n, 2)
+    # The returned block is a view of the filter's own buffer, it is overwritten by the next call
+    def apply_block(
+        self,
+        val: npt.NDArray[np.float64],
+        ctrl: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        n = len(val)
+        x = val if val.ndim == 2 else val[:, None]
+        self._channels(x.shape[1])
+        if len(self._out) < n or self._out.shape[1] != x.shape[1]:
+            self._out = np.empty((max(n, len(self._out)), x.shape[1]))
+        out = self._out[:n]
+
+        # Coefficients change where a control period starts, the first row covers the samples before
+        period = self.control_period
+        first = (-self._k) % period
+        self._k = (self._k + n) % period
+        if ctrl is None:
+            self._refresh()
+            coeffs = self._coeffs[None, :]
+            first = n
+        else:
+            points = ctrl[first::period]
+            coeffs = np.empty((len(points) + 1, 5))
+            coeffs[0] = self._coeffs
+            coeffs[1:] = self._coefficients(points[:, 0], points[:, 1])
+            self._coeffs = coeffs[-1]
+
+        if jit.enabled():
+            kernels.biquad_block(x, out, coeffs, first, period, self._state)
+        else:
+            self._filter_segments(x, out, coeffs, first, period)
+
+        return out if val.ndim == 2 else out[:, 0]
+
+    # numpy fallback, one lfilter call per run of samples sharing coefficients
+    def _filter_segments(
+        self,
+        x: npt.NDArray[np.float64],
+        out: npt.NDArray[np.float64],
+        coeffs: npt.NDArray[np.float64],
+        first: int,
+        period: int,
+    ) -> None:
+        from scipy.signal import lfilter
+
+        bounds = [0, *range(first, len(x), period), len(x)]
+        for row, (start, stop) in enumerate(zip(bounds, bounds[1:])):
+            if stop > start:
+                b0, b1, b2, a1, a2 = coeffs[row]
+                out[start:stop], self._state[:] = lfilter(
+                    (b0, b1, b2), (1.0, a1, a2), x[start:stop], axis=0, zi=self._state
+                )
+
+
+# Filter with its cutoff and resonance following modulators
+# Without a mod function a modulator's value is used as is, e.g. an LFO with wave_range=(200, 2000)
+# cutoff_mod and resonance_mod work like ModulatedOscillator's, e.g. scaling an envelope onto the cutoff
+class ModulatedFilter(Filter):
+    # Cutoff and resonance are rendered together as the control signal
+    control_channels = 2
+
+    def __init__(
+        self,
+        cutoff_modulator=None,
+        resonance_modulator=None,
+        cutoff: float = 1000.0,
+        resonance: float = 0.707,
+        mode: str = "lowpass",
+        sample_rate: int = 44100,
+        control_period: int = 64,
+        cutoff_mod: Optional[ModFunc] = None,
+        resonance_mod: Optional[ModFunc] = None,
+    ) -> None:
+        self.cutoff_modulator = cutoff_modulator
+        self.resonance_modulator = resonance_modulator
+        self.cutoff_mod = cutoff_mod
+        self.resonance_mod = resonance_mod
+        self.init_cutoff = cutoff
+        self.init_resonance = resonance
+        super().__init__(cutoff, resonance, mode, sample_rate, control_period)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "cutoff": self.init_cutoff,
+            "resonance": self.init_resonance,
+            "cutoff_modulator": describe_value(self.cutoff_modulator),
+            "resonance_modulator": describe_value(self.resonance_modulator),
+            "cutoff_mod": describe_value(self.cutoff_mod),
+            "resonance_mod": describe_value(self.resonance_mod),
+        }
+
+    def run_slower(self, period: int) -> None:
+        super().run_slower(period)
+        for modulator in (self.cutoff_modulator, self.resonance_modulator):
+            if modulator is not None:
+                run_slower(modulator, period)
+
+    def reset(self) -> None:
+        self.cutoff = self.init_cutoff
+        self.resonance = self.init_resonance
+        super().reset()
+
+    def __iter__(self) -> "ModulatedFilter":
+        for modulator in (self.cutoff_modulator, self.resonance_modulator):
+            if modulator is not None:
+                iter(modulator)
+        self.reset()
+        return self
+
+    @staticmethod
+    def _mod(mod: Optional[ModFunc], init_val: float, val: Any) -> Any:
+        return val if mod is None else mod(init_val, val)
+
+    @staticmethod
+    def _mod_block(
+        mod: Optional[ModFunc], init_val: float, val: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        if mod is None:
+            return val
+        return ModulatedOscillator._modulate_array(mod, init_val, val)
+
+    def __next__(self) -> Tuple[float, float]:
+        if self.cutoff_modulator is not None:
+            val = next(self.cutoff_modulator)
+            self.cutoff = self._mod(self.cutoff_mod, self.init_cutoff, val)
+        if self.resonance_modulator is not None:
+            val = next(self.resonance_modulator)
+            self.resonance = self._mod(self.resonance_mod, self.init_resonance, val)
+        return (self.cutoff, self.resonance)
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        ctrl = np.empty((n, 2))
+        ctrl[:, 0] = self.cutoff
+        ctrl[:, 1] = self.resonance
+        if self.cutoff_modulator is not None:
+            val = pull_block(self.cutoff_modulator, n)
+            ctrl[:, 0] = self._mod_block(self.cutoff_mod, self.init_cutoff, val)
+        if self.resonance_modulator is not None:
+            val = pull_block(self.resonance_modulator, n)
+            ctrl[:, 1] = self._mod_block(self.resonance_mod, self.init_resonance, val)
+        self.cutoff, self.resonance = float(ctrl[-1, 0]), float(ctrl[-1, 1])
+        return ctrl
+
+    # Only modulators that can end, e.g. envelopes, are released and waited on,
+    # so a filter following LFOs alone has ended straight away and a Chain doesn't wait on it
+    def trigger_release(self, offset: int = 0) -> None:
+        for modulator in self._endable():
+            modulator.trigger_release(offset)
+
+    @property
+    def ended(self) -> bool:
+        return all(modulator.ended for modulator in self._endable())
+
+    def _endable(self) -> List[Any]:
+        return [
+            modulator
+            for modulator in (self.cutoff_modulator, self.resonance_modulator)
+            if modulator is not None and can_end(modulator)
+        ]
+
+
+# Convolution reverb, the signal is convolved with an impulse response and mixed with the dry signal
+# Uses uniformly partitioned convolution so long responses run in realtime:
+# the first partition is convolved directly, the others through FFTs of each full partition of input,
+# kept in a frequency domain delay line and overlap-added back, which needs no extra latency
+# ir is a WAV file path, an array or an ImpulseResponse, spectra are shared through ir_cache
+class ConvolutionReverb(Modifier):
+    channels = 2
+
+    def __init__(
+        self,
+        ir: Union[str, npt.NDArray[np.float64], ImpulseResponse],
+        mix: float = 0.3,
+        sample_rate: int = 44100,
+        partition_size: int = 512,
+        normalize: bool = True,
+    ) -> None:
+        self.ir = ir
+        self.mix = mix
+        self._sample_rate = sample_rate
+        if isinstance(ir, ImpulseResponse):
+            self._ir = ir
+        elif isinstance(ir, str):
+            self._ir = load_impulse_response(ir, sample_rate, partition_size, normalize)
+        else:
+            self._ir = impulse_response(ir, partition_size, normalize)
+        self.partition_size = self._ir.partition_size
+        self.normalize = normalize
+
+        self._work_channels = 0
+        self.reset()
+
+    def describe(self) -> Dict[str, Any]:
+        if isinstance(self.ir, str):
+            path = os.path.abspath(self.ir)
+            ir: Any = {"path": path, "mtime": os.path.getmtime(path)}
+        else:
+            ir = {
+                "head": describe_value(self._ir.head),
+                "spectra": describe_value(self._ir.spectra),
+            }
+        return {
+            "type": type_name(self),
+            "ir": ir,
+            "mix": self.mix,
+            "sample_rate": self._sample_rate,
+            "partition_size": self.partition_size,
+            "normalize": self.normalize,
+        }
+
+    # The response can go quiet for a while and come back, e.g. after a pre-delay
+    @property
+    def tail(self) -> int:
+        return self._ir.length
+
+    def reset(self) -> None:
+        self._setup(self._work_channels or 1)
+
+    # Buffers for the number of channels convolved, 1 when both signal and response are mono
+    def _setup(self, channels: int) -> None:
+        size = self.partition_size
+        partitions = self._ir.partitions
+        self._work_channels = channels
+        self._history = np.zeros((size - 1, channels))
+        self._frame = np.zeros((size, channels))
+        self._fill = 0
+        # Input spectra laid out like the response's, each is written twice
+        # so the last partitions are always one slice
+        self._fdl = np.zeros((size + 1, channels, 2 * partitions), dtype=np.complex128)
+        self._fdl_pos = 0
+        self._spectrum = np.zeros((size + 1, channels), dtype=np.complex128)
+        self._tail = np.zeros((size, channels))
+        self._overlap = np.zeros((size, channels))
+
+    # Runs once per full partition of input, works out the FFT part of the next partition of output
+    def _process_frame(self) -> None:
+        size = self.partition_size
+        partitions = self._ir.partitions
+        if partitions == 0:
+            return
+
+        spectrum = np.fft.rfft(self._frame, n=2 * size, axis=0)
+        self._fdl[:, :, self._fdl_pos] = spectrum
+        self._fdl[:, :, self._fdl_pos + partitions] = spectrum
+        self._fdl_pos = (self._fdl_pos + 1) % partitions
+
+        # Sum over partitions of input spectrum times response spectrum, one dot product per bin
+        fdl = self._fdl[:, :, self._fdl_pos : self._fdl_pos + partitions]
+        np.matmul(
+            fdl[:, :, None, :],
+            self._ir.spectra[:, :, :, None],
+            out=self._spectrum[:, :, None, None],
+        )
+        out = np.fft.irfft(self._spectrum, n=2 * size, axis=0)
+        np.add(out[:size], self._overlap, out=self._tail)
+        self._overlap[:] = out[size:]
+
+    def __call__(self, val: Union[float, Tuple[float, float]]) -> Tuple[float, float]:
+        out = self.apply_block(np.array([val], dtype=np.float64))
+        return (float(out[0, 0]), float(out[0, 1]))
+
+    def apply_block(
+        self,
+        val: npt.NDArray[np.float64],
+        ctrl: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        n = len(val)
+        dry = val if val.ndim == 2 else val[:, None]
+        channels = max(dry.shape[1], self._ir.channels)
+        if channels != self._work_channels:
+            self._setup(channels)
+        x = np.broadcast_to(dry, (n, channels))
+
+        # First partition, directly against the last partition_size - 1 samples and this block
+        wet = np.empty((n, channels))
+        full = np.concatenate((self._history, x))
+        for c in range(channels):
+            head = self._ir.head[:, min(c, self._ir.channels - 1)]
+            wet[:, c] = np.convolve(full[:, c], head, mode="valid")
+        self._history[:] = full[n:]
+
+        # Later partitions, output for each partition was worked out when the last one filled up
+        size = self.partition_size
+        pos = 0
+        while pos < n:
+            m = min(n - pos, size - self._fill)
+            self._frame[self._fill : self._fill + m] = x[pos : pos + m]
+            wet[pos : pos + m] += self._tail[self._fill : self._fill + m]
+            self._fill += m
+            pos += m
+            if self._fill == size:
+                self._process_frame()
+                self._fill = 0
+
+        out = np.empty((n, 2))
+        out[:] = dry * (1 - self.mix)
+        out += wet * self.mix
+        return out
+
+
+# Multi-tap delay, each tap reads the line a fixed time back and the taps are mixed with the dry signal
+# The longest tap is fed back into the line, through feedback_filter if there is one, e.g. a low-pass
+# so each repeat is darker than the last
+# taps are (time in seconds, gain) pairs, a single tap at time with gain 1 if not given
+# The line is a circular buffer sized by max_delay, allocated once, and blocks are read and written
+# without allocating when the JIT backend is available
+class Delay(Modifier):
+    def __init__(
+        self,
+        time: float = 0.25,
+        feedback: float = 0.3,
+        mix: float = 0.3,
+        taps: Optional[Sequence[Tuple[float, float]]] = None,
+        feedback_filter: Optional[Filter] = None,
+        max_delay: Optional[float] = None,
+        sample_rate: int = 44100,
+    ) -> None:
+        taps = [(time, 1.0)] if taps is None else [tuple(tap) for tap in taps]
+        if not taps or any(len(tap) != 2 for tap in taps):
+            raise ValueError("taps must be (time, gain) pairs")
+        if max_delay is None:
+            max_delay = max(t for t, _ in taps)
+        if any(t < 0 or t > max_delay for t, _ in taps):
+            raise ValueError("tap times must be between 0 and max_delay")
+
+        self.taps = taps
+        self.feedback = feedback
+        self.mix = mix
+        self.feedback_filter = feedback_filter
+        self.max_delay = max_delay
+        self._sample_rate = sample_rate
+
+        # Two spare samples, so a read at max_delay can still interpolate
+        self._size = math.ceil(max_delay * sample_rate) + 2
+        times = np.array([t for t, _ in taps]) * sample_rate
+        self._delays = np.clip(times, 1.0, self._size - 2)[None, :]
+        self._gains = np.array([g for _, g in taps], dtype=np.float64)
+        self._fb_tap = int(np.argmax(times))
+
+        self._buf: npt.NDArray[np.float64] = np.zeros((self._size, 1))
+        self._out: npt.NDArray[np.float64] = np.empty((0, 1))
+        self._mod_delays: npt.NDArray[np.float64] = np.empty((0, len(taps)))
+        # Scratch for the numpy fallback, grown to the largest block like _out
+        # Kept flat and viewed at the shape of each run, so the views stay contiguous
+        self._steps: npt.NDArray[np.float64] = np.empty(0)
+        self._read: npt.NDArray[np.float64] = np.empty(0)
+        self._floor: npt.NDArray[np.float64] = np.empty(0)
+        self._idx: npt.NDArray[np.intp] = np.empty(0, dtype=np.intp)
+        self._lo: npt.NDArray[np.float64] = np.empty(0)
+        self._hi: npt.NDArray[np.float64] = np.empty(0)
+        self._wet: npt.NDArray[np.float64] = np.empty((0, 1))
+        self.reset()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "feedback": self.feedback,
+            "mix": self.mix,
+            "taps": [list(tap) for tap in self.taps],
+            "feedback_filter": describe_value(self.feedback_filter),
+            "max_delay": self.max_delay,
+            "sample_rate": self._sample_rate,
+        }
+
+    # Echoes can still be in the line this long after the output goes quiet
+    @property
+    def tail(self) -> int:
+        return self._size
+
+    def reset(self) -> None:
+        self._buf.fill(0.0)
+        self._pos = 0
+        if self.feedback_filter is not None:
+            self.feedback_filter.reset()
+
+    def _channels(self, channels: int) -> None:
+        if self._buf.shape[1] != channels:
+            self._buf = np.zeros((self._size, channels))
+            self._pos = 0
+
+    def __call__(self, val: Union[float, Tuple[float, float]]):
+        out = self.apply_block(np.array([val], dtype=np.float64))
+        return tuple(float(v) for v in out[0]) if out.ndim == 2 else float(out[0])
+
+    # Block version of __call__, ctrl optionally gives a delay time offset in seconds per sample
+    # The returned block is a view of the delay's own buffer, it is overwritten by the next call
+    def apply_block(
+        self,
+        val: npt.NDArray[np.float64],
+        ctrl: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        n = len(val)
+        x = val if val.ndim == 2 else val[:, None]
+        self._channels(x.shape[1])
+        if len(self._out) < n or self._out.shape[1] != x.shape[1]:
+            self._out = np.empty((max(n, len(self._out)), x.shape[1]))
+        out = self._out[:n]
+
+        delays = self._delays
+        if ctrl is not None:
+            if len(self._mod_delays) < n:
+                self._mod_delays = np.empty((n, len(self.taps)))
+            delays = self._mod_delays[:n]
+            np.multiply(ctrl[:, None], self._sample_rate, out=delays)
+            delays += self._delays
+            np.clip(delays, 1.0, self._size - 2, out=delays)
+
+        fb_filter = self.feedback_filter
+        if jit.enabled():
+            filtering = fb_filter is not None
+            if filtering:
+                fb_filter._refresh()
+                fb_filter._channels(x.shape[1])
+                coeffs, state = fb_filter._coeffs, fb_filter._state
+            else:
+                coeffs, state = self._gains, self._buf
+            self._pos = kernels.delay_block(
+                x,
+                out,
+                self._buf,
+                self._pos,
+                delays,
+                self._gains,
+                self.feedback,
+                self._fb_tap,
+                filtering,
+                coeffs,
+                state,
+                self.mix,
+            )
+        else:
+            self._delay_chunks(x, out, delays)
+
+        return out if val.ndim == 2 else out[:, 0]
+
+    # numpy fallback, works through the block in runs no longer than the shortest delay,
+    # so every read in a run is of samples written before it
+    # Every step writes into the scratch buffers, so nothing is allocated once they've grown
+    def _delay_chunks(
+        self,
+        x: npt.NDArray[np.float64],
+        out: npt.NDArray[np.float64],
+        delays: npt.NDArray[np.float64],
+    ) -> None:
+        n, channels = x.shape
+        taps = len(self.taps)
+        if len(self._steps) < n or self._wet.shape[1] != channels:
+            size = max(n, len(self._steps))
+            self._steps = np.arange(size, dtype=np.float64)
+            self._read = np.empty(taps * size)
+            self._floor = np.empty(taps * size)
+            self._idx = np.empty(taps * size, dtype=np.intp)
+            self._lo = np.empty(taps * size * channels)
+            self._hi = np.empty(taps * size * channels)
+            self._wet = np.empty((size, channels))
+
+        modulated = len(delays) > 1
+        pos = 0
+        while pos < n:
+            m = min(n - pos, int(delays[pos:].min() if modulated else delays.min()))
+            d = delays[pos : pos + m] if modulated else delays
+
+            # Read positions, a row per tap, split into whole samples and the fraction between
+            read = self._read[: taps * m].reshape(taps, m)
+            for k in range(taps):
+                delay = d[:, k] if modulated else d[0, k]
+                np.subtract(self._steps[:m], delay, out=read[k])
+            read += self._pos
+            floor = np.floor(read, out=self._floor[: taps * m].reshape(taps, m))
+            idx = self._idx[: taps * m].reshape(taps, m)
+            np.copyto(idx, floor, casting="unsafe")
+            frac = np.subtract(read, floor, out=read)
+
+            # Linear interpolation between the samples either side of each read
+            shape = (taps, m, channels)
+            lo = self._lo[: taps * m * channels].reshape(shape)
+            hi = self._hi[: taps * m * channels].reshape(shape)
+            np.take(self._buf, idx, axis=0, out=lo, mode="wrap")
+            idx += 1
+            np.take(self._buf, idx, axis=0, out=hi, mode="wrap")
+            hi -= lo
+            for c in range(channels):
+                hi[:, :, c] *= frac
+            lo += hi
+
+            wet = self._wet[:m]
+            np.dot(self._gains, lo.reshape(taps, -1), out=wet.reshape(-1))
+            fb = lo[self._fb_tap]
+            if self.feedback_filter is not None:
+                fb = self.feedback_filter.apply_block(fb)
+
+            # The run goes into the line after the reads, wrapping round its end
+            fb *= self.feedback
+            fb += x[pos : pos + m]
+            first = min(m, self._size - self._pos)
+            self._buf[self._pos : self._pos + first] = fb[:first]
+            self._buf[: m - first] = fb[first:]
+
+            block = out[pos : pos + m]
+            np.multiply(x[pos : pos + m], 1 - self.mix, out=block)
+            wet *= self.mix
+            block += wet
+            self._pos = (self._pos + m) % self._size
+            pos += m
+
+
+# Delay with its tap times following a modulator, e.g. an LFO for chorus or flanging
+# The modulator's value is an offset in seconds added to every tap, so max_delay must leave room for it
+# e.g. ModulatedDelay(SineOscillator(0.5, wave_range=(-0.002, 0.002)), time=0.01, feedback=0, max_delay=0.02)
+class ModulatedDelay(Delay):
+    def __init__(
+        self,
+        modulator,
+        time: float = 0.01,
+        feedback: float = 0.0,
+        mix: float = 0.5,
+        taps: Optional[Sequence[Tuple[float, float]]] = None,
+        feedback_filter: Optional[Filter] = None,
+        max_delay: Optional[float] = None,
+        sample_rate: int = 44100,
+    ) -> None:
+        self.modulator = modulator
+        self.offset = 0.0
+        super().__init__(
+            time, feedback, mix, taps, feedback_filter, max_delay, sample_rate
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "modulator": describe_node(self.modulator)}
+
+    def __iter__(self) -> "ModulatedDelay":
+        iter(self.modulator)
+        return self
+
+    def __next__(self) -> float:
+        self.offset = next(self.modulator)
+        return self.offset
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        offset = pull_block(self.modulator, n)
+        self.offset = float(offset[-1])
+        return offset
+
+    def __call__(self, val: Union[float, Tuple[float, float]]):
+        out = self.apply_block(
+            np.array([val], dtype=np.float64), np.array([self.offset], dtype=np.float64)
+        )
+        return tuple(float(v) for v in out[0]) if out.ndim == 2 else float(out[0])
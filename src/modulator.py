@@ -1,6 +1,9 @@
+import copy
 import math
 from typing import (
+    Any,
     Callable,
+    Dict,
     Iterator,
     Optional,
     Tuple,
@@ -8,7 +11,10 @@ from typing import (
     Protocol,
     runtime_checkable,
 )
+import numpy as np
+import numpy.typing as npt
 from src.envelopes import ADSREnvelope
+from src.helpers.describe import describe_node, describe_value, type_name
 from src.oscillators.oscillators import Oscillator
 from src.oscillators.base_oscillator import Generator
 
@@ -29,11 +35,38 @@ class TriggerableFloatGenerator(Protocol):
 
     def __iter__(self) -> Iterator[NumberOrStereo]: ...
     def __next__(self) -> NumberOrStereo: ...
-    def trigger_release(self) -> None: ...
+    def trigger_release(self, offset: int = 0) -> None: ...
 
 
 ModulatorType = Union[Iterator[NumberOrStereo], TriggerableFloatGenerator]
 
+ModFunc = Callable[[float, float], float]
+
+
+# Marks a modulation function as safe to call with a whole block of modulator values
+# e.g. amp_mod=array_mod(lambda init_amp, env: init_amp * env)
+def array_mod(func: ModFunc) -> ModFunc:
+    setattr(func, "array_mod", True)
+    return func
+
+
+# Next n values of any generator, plain iterators without a block path are pulled sample by sample
+def pull_block(gen: Iterator[NumberOrStereo], n: int) -> npt.NDArray[np.float64]:
+    next_block = getattr(gen, "next_block", None)
+    if next_block is not None:
+        return next_block(n)
+    return np.array([next(gen) for _ in range(n)], dtype=np.float64)
+
+
+# Divides the sample rate of a node and of everything inside it, e.g. the oscillator of a Chain
+# The method is looked up on the class, so a wrapper that forwards attributes, e.g. Chain,
+# can't hand the call to one of its children and leave the rest running at full rate
+def run_slower(node: Any, period: int) -> None:
+    method = getattr(type(node), "run_slower", None)
+    if method is None:
+        raise TypeError(f"can't run {type_name(node)} at control rate")
+    method(node, period)
+
 
 class ModulatedOscillator(Generator):
     oscillator: Oscillator
@@ -58,6 +91,21 @@ class ModulatedOscillator(Generator):
         self.phase_mod = phase_mod
         self._modulators_count = len(modulators)
 
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "oscillator": describe_node(self.oscillator),
+            "modulators": [describe_node(mod) for mod in self.modulators],
+            "amp_mod": describe_value(self.amp_mod),
+            "freq_mod": describe_value(self.freq_mod),
+            "phase_mod": describe_value(self.phase_mod),
+        }
+
+    def run_slower(self, period: int) -> None:
+        run_slower(self.oscillator, period)
+        for modulator in self.modulators:
+            run_slower(modulator, period)
+
     def __iter__(self) -> "ModulatedOscillator":
         iter(self.oscillator)
 
@@ -85,13 +133,53 @@ class ModulatedOscillator(Generator):
             new_phase = self.phase_mod(self.oscillator.init_phase, mod_val)
             self.oscillator.phase = new_phase
 
-    def trigger_release(self) -> None:
+    @staticmethod
+    def _modulate_array(
+        mod: ModFunc, init_val: float, mod_vals: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        if getattr(mod, "array_mod", False):
+            return np.broadcast_to(
+                np.asarray(mod(init_val, mod_vals), dtype=np.float64), mod_vals.shape
+            )
+        return np.array([mod(init_val, val) for val in mod_vals], dtype=np.float64)
+
+    # Block version of _modulate, returns the amp, freq and phase arrays for the oscillator
+    def _modulate_block(self, mod_blocks: list[npt.NDArray[np.float64]]) -> Tuple[
+        Optional[npt.NDArray[np.float64]],
+        Optional[npt.NDArray[np.float64]],
+        Optional[npt.NDArray[np.float64]],
+    ]:
+        amp = freq = phase = None
+
+        if self.amp_mod is not None:
+            amp = self._modulate_array(
+                self.amp_mod, self.oscillator.init_amp, mod_blocks[0]
+            )
+
+        if self.freq_mod is not None:
+            mod_block = mod_blocks[1] if self._modulators_count >= 2 else mod_blocks[0]
+            freq = self._modulate_array(
+                self.freq_mod, self.oscillator.init_freq, mod_block
+            )
+
+        if self.phase_mod is not None:
+            if self._modulators_count == 3:
+                mod_block = mod_blocks[2]
+            else:
+                mod_block = mod_blocks[-1]
+            phase = self._modulate_array(
+                self.phase_mod, self.oscillator.init_phase, mod_block
+            )
+
+        return amp, freq, phase
+
+    def trigger_release(self, offset: int = 0) -> None:
         for modulator in self.modulators:
             if isinstance(modulator, TriggerableFloatGenerator):
-                modulator.trigger_release()
+                modulator.trigger_release(offset)
 
         if isinstance(self.oscillator, TriggerableFloatGenerator):
-            self.oscillator.trigger_release()
+            self.oscillator.trigger_release(offset)
 
     @property
     def ended(self) -> bool:
@@ -107,3 +195,111 @@ class ModulatedOscillator(Generator):
         mod_vals = [next(mod) for mod in self.modulators]
         self._modulate(mod_vals)
         return next(self.oscillator)
+
+    # Modulate the oscillator with already rendered modulator blocks
+    def modulate_block(
+        self, n: int, mod_blocks: list[npt.NDArray[np.float64]]
+    ) -> npt.NDArray[np.float64]:
+        amp, freq, phase = self._modulate_block(mod_blocks)
+        return self.oscillator.next_block(n, freq=freq, amp=amp, phase=phase)
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        mod_blocks = [pull_block(mod, n) for mod in self.modulators]
+        return self.modulate_block(n, mod_blocks)
+
+
+# Runs a modulator at control rate, one value every period samples, e.g. for slow LFOs and long envelopes
+# A copy of the modulator runs at its sample rate divided by period, so it keeps its timing for a
+# period-th of the work, and the samples in between are filled in by linear interpolation so
+# parameters don't step (zipper noise)
+# e.g. ModulatedVolume(ControlRate(ADSREnvelope(0.01, 4), 64))
+# It can be released and ended when its modulator can, the release lands within two control values
+# Only the copy plays, the modulator passed in is left as it was and is what describe reports,
+# so a release sent to it, or to a node it shares with the rest of the graph, doesn't reach
+# what plays, e.g. one envelope driving both a ControlRate and a filter runs as two envelopes
+class ControlRate(Generator):
+    # Control values either side of the current sample
+    _a: float
+    _b: float
+    # Samples since _a
+    _t: int
+
+    def __init__(self, modulator: Iterator[float], period: int = 64) -> None:
+        if period < 1:
+            raise ValueError("control period must be at least 1 sample")
+        self.modulator = modulator
+        self._slowed = copy.deepcopy(modulator)
+        run_slower(self._slowed, period)
+        self.period = period
+        self._a = self._b = 0.0
+        self._t = 0
+
+    def __getattr__(self, attr: str):
+        # Before __init__ has run, e.g. while unpickling, there is nothing to look through yet
+        if "_slowed" not in self.__dict__:
+            raise AttributeError(f"attribute '{attr}' does not exist")
+
+        # Only present for modulators that have them, so an LFO stays a plain modulator
+        if isinstance(self._slowed, TriggerableFloatGenerator):
+            if attr == "ended":
+                return self._slowed.ended
+            if attr == "trigger_release":
+                return self._trigger_release
+
+        raise AttributeError(f"attribute '{attr}' does not exist")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "modulator": describe_node(self.modulator),
+            "period": self.period,
+        }
+
+    # Nested inside another ControlRate, each control value is that much further apart
+    def run_slower(self, period: int) -> None:
+        run_slower(self._slowed, period)
+
+    def _trigger_release(self, offset: int = 0) -> None:
+        # The modulator has already made the value after _b, its next one is _b's successor
+        steps = math.ceil((self._t + offset) / self.period) - 2
+        self._slowed.trigger_release(max(0, steps))
+
+    def __iter__(self) -> "ControlRate":
+        iter(self._slowed)
+        self._a = float(next(self._slowed))
+        self._b = float(next(self._slowed))
+        self._t = 0
+        return self
+
+    # Same sum as np.interp, so blocks and single samples come out identical
+    def __next__(self) -> float:
+        val = (self._b - self._a) / self.period * self._t + self._a
+        self._t += 1
+        if self._t == self.period:
+            self._t = 0
+            self._a = self._b
+            self._b = float(next(self._slowed))
+        return val
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        # Control values sit every period samples from _a, the first two are _a and _b
+        new = (self._t + n) // self.period
+        points = np.empty(new + 2)
+        points[0] = self._a
+        points[1] = self._b
+        # A block the length of the period needs one new value, a plain next() is cheaper for that
+        if new == 1:
+            points[2] = next(self._slowed)
+        elif new:
+            points[2:] = pull_block(self._slowed, new)
+
+        val = np.interp(
+            np.arange(self._t, self._t + n, dtype=np.float64),
+            np.arange(0, (new + 2) * self.period, self.period, dtype=np.float64),
+            points,
+        )
+
+        self._a = float(points[new])
+        self._b = float(points[new + 1])
+        self._t = (self._t + n) % self.period
+        return val
@@ -1,4 +1,11 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Union
+import numpy as np
+import numpy.typing as npt
+from src.helpers import jit, kernels
+from src.helpers.describe import type_name
+
+ArrayOrFloat = Union[float, npt.NDArray[np.float64]]
 
 
 # A generator generates a signal that can be played, e.g. a waveform
@@ -17,6 +24,7 @@ class Oscillator(Generator):
     _a: float
     _p: float
     _i: float
+    _step: float
 
     def __init__(
         self,
@@ -40,6 +48,11 @@ class Oscillator(Generator):
     def init_freq(self):
         return self._freq
 
+    # Takes effect the next time the oscillator is iterated, e.g. when a voice is retuned
+    @init_freq.setter
+    def init_freq(self, value: float) -> None:
+        self._freq = value
+
     @property
     def init_amp(self):
         return self._amp
@@ -84,6 +97,21 @@ class Oscillator(Generator):
     def _post_phase_set(self):
         pass
 
+    # Canonical description of the settings the oscillator starts from, see src.helpers.describe
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "freq": self._freq,
+            "phase": self._phase,
+            "amp": self._amp,
+            "sample_rate": self._sample_rate,
+            "wave_range": list(self._wave_range),
+        }
+
+    # Divides the sample rate, e.g. to run once every period samples as a ControlRate modulator
+    def run_slower(self, period: int) -> None:
+        self._sample_rate = self._sample_rate / period
+
     @abstractmethod
     def _initialize_osc(self):
         pass
@@ -93,10 +121,96 @@ class Oscillator(Generator):
         # Normalise by higher range val
         return (((val + 1) / 2) * (max_val - min_val)) + min_val
 
+    # Phase step per sample for a freq, and the internal phase offset for a phase in degrees
+    # Both accept arrays so modulation can be applied a block at a time
+    @abstractmethod
+    def _step_for(self, freq: ArrayOrFloat) -> ArrayOrFloat:
+        pass
+
+    @abstractmethod
+    def _phase_for(self, phase: ArrayOrFloat) -> ArrayOrFloat:
+        pass
+
+    # Phase positions for the next n samples, continuing from where the last sample or block ended
+    # A freq array is integrated sample by sample, so FM stays phase continuous
+    def _advance(
+        self, n: int, freq: Optional[npt.NDArray[np.float64]] = None
+    ) -> npt.NDArray[np.float64]:
+        if freq is None:
+            i = self._i + self._step * np.arange(n)
+            self._i = self._i + self._step * n
+            return i
+
+        step = self._step_for(freq)
+        if jit.enabled():
+            i = np.empty(n)
+            self._i = kernels.accumulate_phase(self._i, step, i)
+        else:
+            i = self._i + np.cumsum(step) - step
+            self._i = i[-1] + step[-1]
+        self.freq = float(freq[-1])
+        return i
+
+    # Wave shape over an array of phase positions, overridden by oscillators with a vectorised path
+    # Deliberately not abstract, next_block checks whether it's been overridden
+    # and renders sample by sample through __next__ when it hasn't
+    def _wave_block(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        raise NotImplementedError
+
     @abstractmethod
     def __next__(self) -> float:
         return 0.0
 
+    # Block version of __next__, returns the next n samples as an array
+    # freq, amp and phase optionally give a per-sample value for this block, as ModulatedOscillator would set
+    def next_block(
+        self,
+        n: int,
+        freq: Optional[npt.NDArray[np.float64]] = None,
+        amp: Optional[npt.NDArray[np.float64]] = None,
+        phase: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        if type(self)._wave_block is Oscillator._wave_block:
+            return self._next_block_per_sample(n, freq, amp, phase)
+
+        x = self._advance(n, freq)
+        if phase is None:
+            x += self._p
+        else:
+            x += self._phase_for(phase)
+            self.phase = float(phase[-1])
+
+        val = self._wave_block(x)
+        if amp is None:
+            return val * self._a
+
+        self.amp = float(amp[-1])
+        return val * amp
+
+    # Fallback for oscillators without a vectorised path
+    def _next_block_per_sample(
+        self,
+        n: int,
+        freq: Optional[npt.NDArray[np.float64]],
+        amp: Optional[npt.NDArray[np.float64]],
+        phase: Optional[npt.NDArray[np.float64]],
+    ) -> npt.NDArray[np.float64]:
+        out = np.empty(n)
+        for k in range(n):
+            if amp is not None:
+                self.amp = amp[k]
+            if freq is not None:
+                self.freq = freq[k]
+            if phase is not None:
+                self.phase = phase[k]
+            out[k] = next(self)
+        return out
+
+    # Render n_frames from the start of the waveform
+    def render(self, n_frames: int) -> npt.NDArray[np.float64]:
+        iter(self)
+        return self.next_block(n_frames)
+
     def __iter__(self):
         self.freq = self._freq
         self.phase = self._phase
@@ -0,0 +1,161 @@
+from abc import abstractmethod
+from typing import Any, Dict
+import numpy as np
+import numpy.typing as npt
+from src.helpers.describe import type_name
+from src.helpers.utils import hash31_array
+from src.oscillators.base_oscillator import ArrayOrFloat, Generator, Oscillator
+
+# Noise is hashed from the index of each sample rather than drawn from a random generator,
+# so a seed always gives the same samples however the output is split into blocks
+# Indices are laid out on a grid of rows, with the seed as the third coordinate,
+# this keeps the hash inputs small enough to stay exact over hours of samples
+_ROW = 4096
+
+
+def _lattice(i: npt.NDArray[np.int64], seed: ArrayOrFloat) -> npt.NDArray[np.float64]:
+    p = np.empty(i.shape + (3,))
+    p[..., 0] = i % _ROW
+    p[..., 1] = i // _ROW
+    p[..., 2] = seed
+    return hash31_array(p)
+
+
+class _Noise(Generator):
+    def __init__(
+        self,
+        amp: float = 1.0,
+        seed: int = 0,
+        sample_rate: int = 44100,
+        wave_range: tuple[float, float] = (-1, 1),
+    ) -> None:
+        self.amp = amp
+        self.seed = seed
+        self._sample_rate = sample_rate
+        self._wave_range = wave_range
+        self._k = 0
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "amp": self.amp,
+            "seed": self.seed,
+            "sample_rate": self._sample_rate,
+            "wave_range": list(self._wave_range),
+        }
+
+    # Divides the sample rate, noise with a freq works its steps out from it when iterated
+    def run_slower(self, period: int) -> None:
+        self._sample_rate = self._sample_rate / period
+
+    def _initialize_noise(self) -> None:
+        pass
+
+    def __iter__(self) -> "_Noise":
+        self._k = 0
+        self._initialize_noise()
+        return self
+
+    # Noise for the next n samples, -1..1
+    @abstractmethod
+    def _noise_block(self, n: int) -> npt.NDArray[np.float64]:
+        pass
+
+    def __next__(self) -> float:
+        return float(self.next_block(1)[0])
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        val = self._noise_block(n)
+        self._k += n
+
+        if self._wave_range != (-1, 1):
+            val = Oscillator.squish_val(val, *self._wave_range)
+
+        return val * self.amp
+
+
+# Uniform white noise, every sample hashed on its own
+class WhiteNoise(_Noise):
+    def _noise_block(self, n: int) -> npt.NDArray[np.float64]:
+        return _lattice(self._k + np.arange(n), self.seed)
+
+
+# Pink noise, white noise through a filter falling 3dB per octave
+# The filter is run a block at a time, carrying its state between blocks
+class PinkNoise(_Noise):
+    # Three pole, three zero fit to a 1/f slope within 0.05dB over the audio range
+    B = np.array([0.049922035, -0.095993537, 0.050612699, -0.004408786])
+    A = np.array([1.0, -2.494956002, 2.017265875, -0.522189400])
+    # Brings the filtered noise up to an RMS of about 0.2, peaks stay within -1..1
+    GAIN = 4.0
+
+    def _initialize_noise(self) -> None:
+        self._state = np.zeros(len(self.A) - 1)
+
+    def _noise_block(self, n: int) -> npt.NDArray[np.float64]:
+        # Imported here so scipy is only loaded once pink noise is used
+        from scipy.signal import lfilter
+
+        white = _lattice(self._k + np.arange(n), self.seed)
+        pink, self._state = lfilter(self.B, self.A, white, zi=self._state)
+        return self.GAIN * pink
+
+
+# Fractional Brownian motion, octaves of smoothly interpolated value noise summed together
+# freq is how many random values per second the lowest octave moves between,
+# each octave after it has lacunarity times as many and persistence times the amplitude
+# e.g. a slow random LFO, FBMNoise(freq=2, octaves=4, wave_range=(200, 2000))
+class FBMNoise(_Noise):
+    def __init__(
+        self,
+        freq: float = 100.0,
+        octaves: int = 6,
+        lacunarity: float = 2.0,
+        persistence: float = 0.5,
+        amp: float = 1.0,
+        seed: int = 0,
+        sample_rate: int = 44100,
+        wave_range: tuple[float, float] = (-1, 1),
+    ) -> None:
+        super().__init__(amp, seed, sample_rate, wave_range)
+        self.freq = freq
+        self.octaves = octaves
+        self.lacunarity = lacunarity
+        self.persistence = persistence
+
+        gains = persistence ** np.arange(octaves)
+        self._gains = gains / gains.sum()
+        # Every octave hashes its own lattice
+        self._seeds = seed + _ROW * (1 + np.arange(octaves))
+        self._initialize_noise()
+
+    # Worked out when iterated, so a change of sample rate, e.g. by ControlRate, is picked up
+    def _initialize_noise(self) -> None:
+        octaves = np.arange(self.octaves)
+        self._rates = self.freq * self.lacunarity**octaves / self._sample_rate
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "freq": self.freq,
+            "octaves": self.octaves,
+            "lacunarity": self.lacunarity,
+            "persistence": self.persistence,
+        }
+
+    # Only the lattice points the block passes through are hashed, a handful per octave
+    # for the low octaves, then every sample blends the two either side of it
+    def _noise_block(self, n: int) -> npt.NDArray[np.float64]:
+        k = self._k + np.arange(n)
+        out = np.zeros(n)
+        for rate, gain, seed in zip(self._rates, self._gains, self._seeds):
+            x = k * rate
+            i = np.floor(x).astype(np.int64)
+            t = x - i
+            t = t * t * (3 - 2 * t)
+
+            values = _lattice(np.arange(i[0], i[-1] + 2), seed)
+            a = values[i - i[0]]
+            b = values[i - i[0] + 1]
+            out += gain * (a + (b - a) * t)
+        return out
@@ -1,13 +1,22 @@
-from src.oscillators.base_oscillator import Oscillator
+from src.oscillators.base_oscillator import Oscillator, ArrayOrFloat
 import math
+from typing import Any, Dict
+import numpy as np
+import numpy.typing as npt
 
 
 class SineOscillator(Oscillator):
+    def _step_for(self, freq: ArrayOrFloat) -> ArrayOrFloat:
+        return (2 * math.pi * freq) / self._sample_rate
+
+    def _phase_for(self, phase: ArrayOrFloat) -> ArrayOrFloat:
+        return (phase / 360) * 2 * math.pi
+
     def _post_freq_set(self):
-        self._step = (2 * math.pi * self._f) / self._sample_rate
+        self._step = self._step_for(self._f)
 
     def _post_phase_set(self):
-        self._p = (self._p / 360) * 2 * math.pi
+        self._p = self._phase_for(self._p)
 
     def _initialize_osc(self):
         self._i = 0
@@ -21,6 +30,14 @@ class SineOscillator(Oscillator):
 
         return val * self._a
 
+    def _wave_block(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        val = np.sin(x)
+
+        if self._wave_range != (-1, 1):
+            val = self.squish_val(val, *self._wave_range)
+
+        return val
+
 
 class SquareOscillator(SineOscillator):
     def __init__(
@@ -35,6 +52,9 @@ class SquareOscillator(SineOscillator):
         super().__init__(freq, phase, amp, sample_rate, wave_range)
         self.threshold = threshold
 
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "threshold": self.threshold}
+
     def __next__(self):
         val: float = math.sin(self._i + self._p)
         self._i = self._i + self._step
@@ -44,37 +64,64 @@ class SquareOscillator(SineOscillator):
 
         return val * self._a
 
+    def _wave_block(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        low, high = self._wave_range
+        return np.where(np.sin(x) < self.threshold, float(low), float(high))
+
 
 class SawtoothOscillator(Oscillator):
+    # Phase is tracked in cycles, so a change in freq keeps the wave continuous
+    def _step_for(self, freq: ArrayOrFloat) -> ArrayOrFloat:
+        return freq / self._sample_rate
+
+    def _phase_for(self, phase: ArrayOrFloat) -> ArrayOrFloat:
+        return (phase + 90) / 360
+
     def _post_freq_set(self):
-        self._period = self._sample_rate / self._f
-        self._post_phase_set
+        self._step = self._step_for(self._f)
 
     def _post_phase_set(self):
-        self._p = ((self._p + 90) / 360) * self._period
+        self._p = self._phase_for(self._p)
 
     def _initialize_osc(self):
         self._i = 0
 
     def __next__(self):
-        div: float = (self._i + self._p) / self._period
+        div: float = self._i + self._p
         val: float = 2 * (div - math.floor(0.5 + div))
-        self._i = self._i + 1
+        self._i = self._i + self._step
 
         if self._wave_range != (-1, 1):
             val = self.squish_val(val, *self._wave_range)
 
         return val * self._a
 
+    def _wave_block(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        val = 2 * (x - np.floor(0.5 + x))
+
+        if self._wave_range != (-1, 1):
+            val = self.squish_val(val, *self._wave_range)
+
+        return val
+
 
 class TriangleOscillator(SawtoothOscillator):
     def __next__(self):
-        div: float = (self._i + self._p) / self._period
+        div: float = self._i + self._p
         val: float = 2 * (div - math.floor(0.5 + div))
         val = (abs(val) - 0.5) * 2
-        self._i = self._i + 1
+        self._i = self._i + self._step
 
         if self._wave_range != (-1, 1):
             val = self.squish_val(val, *self._wave_range)
 
         return val * self._a
+
+    def _wave_block(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        val = 2 * (x - np.floor(0.5 + x))
+        val = (np.abs(val) - 0.5) * 2
+
+        if self._wave_range != (-1, 1):
+            val = self.squish_val(val, *self._wave_range)
+
+        return val
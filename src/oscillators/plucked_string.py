@@ -0,0 +1,200 @@
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import numpy.typing as npt
+from src.helpers.describe import type_name
+from src.oscillators.base_oscillator import Generator
+
+
+# Karplus-Strong plucked strings, a burst of noise circulating through a delay line one period long
+# Each pass through the loop averages neighbouring samples, so the upper harmonics die away first
+# Every string lives in one row of a shared (strings, samples) delay line and they're all stepped together,
+# the loop only looks back at least one period, so a block is rendered in runs as long as the shortest period
+# with every run a handful of array operations across all the strings
+# decay is the seconds each string takes to fall by 60dB, ignoring the extra damping of the averaging,
+# release_duration is how quickly the strings are muted once released
+# strum delays each string's pluck by that many seconds after the one before it
+# The noise bursts are drawn from seed, so the same seed always plucks the same
+class PluckedStrings(Generator):
+    ended: bool
+
+    def __init__(
+        self,
+        freqs: Sequence[float],
+        amps: Optional[Sequence[float]] = None,
+        decay: float = 2.0,
+        release_duration: float = 0.1,
+        strum: float = 0.0,
+        sample_rate: int = 44100,
+        seed: int = 0,
+    ) -> None:
+        self._freqs = [float(f) for f in freqs]
+        self._amps = (
+            [1.0] * len(self._freqs) if amps is None else [float(a) for a in amps]
+        )
+        if not self._freqs or len(self._amps) != len(self._freqs):
+            raise ValueError("need one amp per string")
+        if any(f <= 0 or f > sample_rate / 1.5 for f in self._freqs):
+            raise ValueError(f"string freqs must be between 0 and {sample_rate / 1.5}")
+
+        self.decay = decay
+        self.release_duration = release_duration
+        self.strum = strum
+        self.seed = seed
+        self._sample_rate = sample_rate
+        self.ended = False
+        self._tune()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "freqs": list(self._freqs),
+            "amps": list(self._amps),
+            "decay": self.decay,
+            "release_duration": self.release_duration,
+            "strum": self.strum,
+            "sample_rate": self._sample_rate,
+            "seed": self.seed,
+        }
+
+    # Divides the sample rate, the strings are tuned to it again when they're plucked
+    def run_slower(self, period: int) -> None:
+        self._sample_rate = self._sample_rate / period
+
+    # Delay line lengths and read weights for the current freqs
+    def _tune(self) -> None:
+        # The averaging adds half a sample to the loop, so each string reads its line
+        # period - 0.5 samples back, interpolated linearly between the two nearest samples
+        delay = self._sample_rate / np.array(self._freqs) - 0.5
+        self._lengths = np.floor(delay).astype(np.intp)
+        frac = delay - self._lengths
+        self._weights = np.stack(
+            [0.5 * (1 - frac), np.full_like(frac, 0.5), 0.5 * frac]
+        )
+        self._periods = delay + 0.5
+        self._size = int(self._lengths.max()) + 3
+        self._rows = np.arange(len(self._freqs))[:, None]
+
+    # Loop gain per sample that brings a string down 60dB in seconds
+    def _loop_gain(self, seconds: float) -> npt.NDArray[np.float64]:
+        if seconds <= 0:
+            return np.zeros(len(self._freqs))
+        return 10.0 ** (-3.0 * self._periods / (seconds * self._sample_rate))
+
+    def __iter__(self) -> "PluckedStrings":
+        self._tune()
+        self.ended = False
+        self._t = 0
+        self._pos = 0
+        self._release_at: Optional[int] = None
+        self._gain = self._loop_gain(self.decay)
+        self._line: npt.NDArray[np.float64] = np.zeros((len(self._freqs), self._size))
+
+        # Each string is excited by one period of noise, fed into its line from its pluck onwards
+        self._onsets = np.round(
+            np.arange(len(self._freqs)) * self.strum * self._sample_rate
+        ).astype(np.intp)
+        width = int(self._lengths.max())
+        rng = np.random.default_rng(self.seed)
+        self._burst = np.zeros((len(self._freqs), width + 1))
+        burst = self._burst[:, :width]
+        burst[:] = rng.uniform(-1.0, 1.0, burst.shape)
+        # Each string only plucks with its first period of noise, and without its mean
+        # a burst doesn't leave an offset circulating in the line
+        period = np.arange(width) < self._lengths[:, None]
+        burst *= period
+        burst -= (burst.sum(axis=1) / self._lengths)[:, None]
+        burst *= period * np.array(self._amps)[:, None]
+
+        # Once every string has rung out, 60dB down, the generator has ended
+        ring = self._lengths.max() + self.decay * self._sample_rate
+        self._end_at = int(self._onsets.max() + ring)
+        return self
+
+    def trigger_release(self, offset: int = 0) -> None:
+        self._release_at = self._t + offset
+
+    def __next__(self) -> float:
+        return float(self.next_block(1)[0])
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        out = np.zeros(n)
+        shortest = int(self._lengths.min())
+        pos = 0
+        while pos < n:
+            m = min(n - pos, shortest)
+            if self._release_at is not None:
+                if self._release_at <= self._t:
+                    self._gain = self._loop_gain(self.release_duration)
+                    self._end_at = min(
+                        self._end_at,
+                        self._t + int(self.release_duration * self._sample_rate),
+                    )
+                    self._release_at = None
+                else:
+                    m = min(m, self._release_at - self._t)
+
+            out[pos : pos + m] = self._run(m)
+            pos += m
+
+        if self._t >= self._end_at:
+            self.ended = True
+        return out
+
+    # Steps every string m samples, m is at most the shortest line
+    # so every sample read was written before this run
+    def _run(self, m: int) -> npt.NDArray[np.float64]:
+        steps = np.arange(m)
+        write = (self._pos + steps) % self._size
+        read = write[None, :] - self._lengths[:, None]
+        line = self._line
+        w = self._weights
+        y = (
+            w[0][:, None] * line[self._rows, read % self._size]
+            + w[1][:, None] * line[self._rows, (read - 1) % self._size]
+            + w[2][:, None] * line[self._rows, (read - 2) % self._size]
+        )
+        y *= self._gain[:, None]
+
+        # Burst samples past a string's length read the zero column at the end
+        k = self._t + steps[None, :] - self._onsets[:, None]
+        playing = (k >= 0) & (k < self._lengths[:, None])
+        y += self._burst[self._rows, np.where(playing, k, -1)]
+
+        line[:, write] = y
+        self._pos = (self._pos + m) % self._size
+        self._t += m
+        return y.sum(axis=0)
+
+
+# A single plucked string, freq can be retuned between notes like an oscillator's
+class PluckedString(PluckedStrings):
+    def __init__(
+        self,
+        freq: float = 440.0,
+        amp: float = 1.0,
+        decay: float = 2.0,
+        release_duration: float = 0.1,
+        sample_rate: int = 44100,
+        seed: int = 0,
+    ) -> None:
+        super().__init__([freq], [amp], decay, release_duration, 0.0, sample_rate, seed)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "freq": self._freqs[0],
+            "amp": self._amps[0],
+            "decay": self.decay,
+            "release_duration": self.release_duration,
+            "sample_rate": self._sample_rate,
+            "seed": self.seed,
+        }
+
+    @property
+    def init_freq(self) -> float:
+        return self._freqs[0]
+
+    # Takes effect the next time the string is plucked
+    @init_freq.setter
+    def init_freq(self, value: float) -> None:
+        self._freqs = [value]
@@ -0,0 +1,141 @@
+import math
+from typing import Any, Dict, Optional, Tuple, Union
+import numpy as np
+import numpy.typing as npt
+from src.helpers.describe import describe_node, type_name
+from src.helpers.utils import hash31_array
+from src.oscillators.base_oscillator import ArrayOrFloat, Oscillator
+
+
+# Unison stacks copies of an oscillator's waveform, detuned from each other, e.g. a supersaw
+# UnisonOscillator(SawtoothOscillator(110), voices=7, detune=30, stereo_spread=0.8)
+# The copies are columns of one (samples, voices) array of phase positions, rendered by a single
+# call to the oscillator's _wave_block and mixed down with a single matrix product,
+# so adding voices costs more array work but no more Python
+# detune is the spread in cents between the lowest and highest voice
+# stereo_spread pans the voices from the middle out to the edges at 1, with 0 the output is mono
+# random_phase is how much of a cycle each voice's starting phase is randomly offset by,
+# the offsets are hashed from seed so the same seed always renders the same
+# Voices are mixed at 1 / sqrt(voices), so the level stays about the same as the voice count changes
+class UnisonOscillator(Oscillator):
+    def __init__(
+        self,
+        oscillator: Oscillator,
+        voices: int = 7,
+        detune: float = 20.0,
+        stereo_spread: float = 0.0,
+        random_phase: float = 1.0,
+        seed: int = 0,
+    ) -> None:
+        if not isinstance(oscillator, Oscillator):
+            raise TypeError("unison needs an oscillator to stack")
+        if voices < 1:
+            raise ValueError("unison needs at least one voice")
+        if type(oscillator)._wave_block is Oscillator._wave_block:
+            raise ValueError(
+                f"{type(oscillator).__name__} has no block path to render voices"
+            )
+
+        super().__init__(
+            oscillator.init_freq,
+            oscillator.init_phase,
+            oscillator.init_amp,
+            oscillator._sample_rate,
+            oscillator._wave_range,
+        )
+        self.oscillator = oscillator
+        self.voices = voices
+        self.detune = detune
+        self.stereo_spread = stereo_spread
+        self.random_phase = random_phase
+        self.seed = seed
+
+        # A single voice sits in the middle, with no detune or pan
+        spread = np.linspace(-1.0, 1.0, voices) if voices > 1 else np.zeros(1)
+        self._ratios = 2.0 ** (spread * detune / 2400)
+        self._offsets = np.zeros(voices)
+
+        # Equal power pan of each voice, one column per output channel
+        gain = 1 / math.sqrt(voices)
+        if stereo_spread > 0:
+            angle = (stereo_spread * spread + 1) * math.pi / 4
+            self._mix = gain * np.column_stack((np.cos(angle), np.sin(angle)))
+        else:
+            self._mix = np.full((voices, 1), gain)
+
+    @property
+    def channels(self) -> int:
+        return self._mix.shape[1]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "oscillator": describe_node(self.oscillator),
+            "freq": self._freq,
+            "voices": self.voices,
+            "detune": self.detune,
+            "stereo_spread": self.stereo_spread,
+            "random_phase": self.random_phase,
+            "seed": self.seed,
+        }
+
+    # The voices step at the oscillator's sample rate, so it slows down along with the stack
+    def run_slower(self, period: int) -> None:
+        super().run_slower(period)
+        self.oscillator.run_slower(period)
+
+    # Phase units are the oscillator's own, radians or cycles
+    def _step_for(self, freq: ArrayOrFloat) -> ArrayOrFloat:
+        return self.oscillator._step_for(freq)
+
+    def _phase_for(self, phase: ArrayOrFloat) -> ArrayOrFloat:
+        return self.oscillator._phase_for(phase)
+
+    def _post_freq_set(self):
+        self._step = self._step_for(self._f)
+        # Keeps freq dependent state in step, e.g. a wavetable's mip level
+        self.oscillator.freq = self._f
+
+    def _post_phase_set(self):
+        self._p = self._phase_for(self._p)
+
+    def _initialize_osc(self):
+        self._i = 0
+        self.oscillator.init_freq = self._freq
+        iter(self.oscillator)
+        # Start of each voice in the oscillator's phase units, as a fraction of a cycle
+        cycle = self._phase_for(360.0) - self._phase_for(0.0)
+        p = np.zeros((self.voices, 3))
+        p[:, 0] = np.arange(self.voices)
+        p[:, 2] = self.seed
+        self._offsets = self.random_phase * cycle * (hash31_array(p) + 1) / 2
+
+    def __next__(self) -> Union[float, Tuple[float, float]]:
+        val = self.next_block(1)[0]
+        return tuple(val) if self.channels == 2 else float(val)
+
+    # Every voice follows the same freq, amp and phase modulation, scaled by its detune
+    def next_block(
+        self,
+        n: int,
+        freq: Optional[npt.NDArray[np.float64]] = None,
+        amp: Optional[npt.NDArray[np.float64]] = None,
+        phase: Optional[npt.NDArray[np.float64]] = None,
+    ) -> npt.NDArray[np.float64]:
+        # A voice at ratio r of the freq has travelled r times as far through its cycles
+        x = self._advance(n, freq)[:, None] * self._ratios + self._offsets
+        if phase is None:
+            x += self._p
+        else:
+            x += self._phase_for(phase)[:, None]
+            self.phase = float(phase[-1])
+
+        val = self.oscillator._wave_block(x) @ self._mix
+        if self.channels == 1:
+            val = val[:, 0]
+
+        if amp is None:
+            return val * self._a
+
+        self.amp = float(amp[-1])
+        return val * (amp if self.channels == 1 else amp[:, None])
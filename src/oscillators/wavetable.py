@@ -0,0 +1,200 @@
+from collections import OrderedDict
+import math
+import threading
+from typing import Any, Callable, Dict, Tuple
+import numpy as np
+import numpy.typing as npt
+from src.oscillators.base_oscillator import Oscillator, ArrayOrFloat
+
+# Lowest fundamental a mip level is built for, level k is alias free up to BASE_FREQ * 2**k
+BASE_FREQ = 20.0
+
+
+# Fourier amplitude of harmonic k for each waveform, all shapes are sums of sines over one cycle
+def _saw(k: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return (2 / math.pi) * np.where(k % 2 == 1, 1.0, -1.0) / k
+
+
+def _square(k: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return np.where(k % 2 == 1, (4 / math.pi) / k, 0.0)
+
+
+def _triangle(k: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    sign = np.where((k - 1) % 4 == 0, 1.0, -1.0)
+    return np.where(k % 2 == 1, (8 / math.pi**2) * sign / k**2, 0.0)
+
+
+def _sine(k: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    return np.where(k == 1, 1.0, 0.0)
+
+
+HARMONICS: Dict[str, Callable[[npt.NDArray[np.float64]], npt.NDArray[np.float64]]] = {
+    "sine": _sine,
+    "saw": _saw,
+    "square": _square,
+    "triangle": _triangle,
+}
+
+# Degrees into the table each waveform starts at, so it lines up with its naive oscillator,
+# e.g. SawtoothOscillator starts a quarter cycle into its ramp
+PHASE_OFFSETS: Dict[str, float] = {"saw": 90.0}
+
+
+# One band limited table per octave, rows padded with one sample before and two after
+# so linear and cubic interpolation never need to wrap an index
+def build_mipmap(
+    waveform: str, table_size: int = 2048, sample_rate: int = 44100
+) -> npt.NDArray[np.float64]:
+    amplitudes = HARMONICS[waveform]
+    nyquist = sample_rate / 2
+    levels = max(1, math.ceil(math.log2(nyquist / BASE_FREQ)))
+    harmonics = np.arange(1, table_size // 2)
+
+    tables = np.empty((levels, table_size + 3))
+    for level in range(levels):
+        top_harmonic = int(nyquist / (BASE_FREQ * 2**level))
+        spectrum = np.zeros(table_size // 2 + 1, dtype=np.complex128)
+        band = harmonics[harmonics <= top_harmonic]
+        spectrum[band] = -1j * amplitudes(band.astype(np.float64)) * table_size / 2
+        table = np.fft.irfft(spectrum, table_size)
+        tables[level, 1:-2] = table
+        tables[level, 0] = table[-1]
+        tables[level, -2:] = table[:2]
+
+    # Every level shares the gain of the richest one, so the level doesn't jump between octaves
+    tables /= np.abs(tables[0]).max()
+    tables.flags.writeable = False
+    return tables
+
+
+# Process wide cache of mip maps, shared by every voice using the same waveform
+# The least recently used mip maps are dropped once the cache goes over max_bytes
+class WavetableCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._tables: "OrderedDict[Tuple[str, int, int], npt.NDArray[np.float64]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(
+        self, waveform: str, table_size: int = 2048, sample_rate: int = 44100
+    ) -> npt.NDArray[np.float64]:
+        key = (waveform, table_size, sample_rate)
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                return self._tables[key]
+
+        tables = build_mipmap(waveform, table_size, sample_rate)
+        with self._lock:
+            if key not in self._tables:
+                self._tables[key] = tables
+                self.nbytes += tables.nbytes
+            # Never evict the table just asked for, even if it alone is over the limit
+            while self.nbytes > self.max_bytes and len(self._tables) > 1:
+                _, evicted = self._tables.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            return self._tables[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self.nbytes = 0
+
+
+wavetable_cache = WavetableCache()
+
+
+class WavetableOscillator(Oscillator):
+    def __init__(
+        self,
+        freq: float = 440.0,
+        phase: float = 0,
+        amp: float = 1.0,
+        sample_rate: int = 44100,
+        wave_range: tuple[float, float] = (-1, 1),
+        waveform: str = "saw",
+        interpolation: str = "linear",
+        table_size: int = 2048,
+    ):
+        if waveform not in HARMONICS:
+            raise ValueError(f"unknown waveform '{waveform}'")
+        if interpolation not in ("linear", "cubic"):
+            raise ValueError("interpolation must be 'linear' or 'cubic'")
+
+        super().__init__(freq, phase, amp, sample_rate, wave_range)
+        self.waveform = waveform
+        self.interpolation = interpolation
+        self.table_size = table_size
+        self._tables = wavetable_cache.get(waveform, table_size, sample_rate)
+        self._table = self._tables[0]
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            **super().describe(),
+            "waveform": self.waveform,
+            "interpolation": self.interpolation,
+            "table_size": self.table_size,
+        }
+
+    # Phase is tracked in cycles
+    def _step_for(self, freq: ArrayOrFloat) -> ArrayOrFloat:
+        return freq / self._sample_rate
+
+    def _phase_for(self, phase: ArrayOrFloat) -> ArrayOrFloat:
+        return (phase + PHASE_OFFSETS.get(self.waveform, 0.0)) / 360
+
+    def _post_freq_set(self):
+        self._step = self._step_for(self._f)
+        # Highest octave table that is still alias free at this freq
+        level = math.ceil(math.log2(max(abs(self._f), BASE_FREQ) / BASE_FREQ))
+        self._table = self._tables[min(level, len(self._tables) - 1)]
+
+    def _post_phase_set(self):
+        self._p = self._phase_for(self._p)
+
+    def _initialize_osc(self):
+        self._i = 0
+
+    def __next__(self):
+        pos: float = ((self._i + self._p) % 1.0) * self.table_size
+        self._i = self._i + self._step
+
+        i = min(int(pos), self.table_size - 1)
+        t = pos - i
+        # Tables are offset by one padding sample
+        table = self._table
+        if self.interpolation == "linear":
+            val = table[i + 1] + (table[i + 2] - table[i + 1]) * t
+        else:
+            val = self._cubic(table[i], table[i + 1], table[i + 2], table[i + 3], t)
+
+        if self._wave_range != (-1, 1):
+            val = self.squish_val(val, *self._wave_range)
+
+        return val * self._a
+
+    @staticmethod
+    def _cubic(y0, y1, y2, y3, t):
+        # Catmull-Rom spline through y1 and y2
+        curve = 2 * y0 - 5 * y1 + 4 * y2 - y3 + t * (3 * (y1 - y2) + y3 - y0)
+        return y1 + 0.5 * t * (y2 - y0 + t * curve)
+
+    def _wave_block(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        pos = (x % 1.0) * self.table_size
+        i = np.minimum(pos.astype(np.intp), self.table_size - 1)
+        t = pos - i
+
+        table = self._table
+        if self.interpolation == "linear":
+            y1 = table[i + 1]
+            val = y1 + (table[i + 2] - y1) * t
+        else:
+            val = self._cubic(table[i], table[i + 1], table[i + 2], table[i + 3], t)
+
+        if self._wave_range != (-1, 1):
+            val = self.squish_val(val, *self._wave_range)
+
+        return val
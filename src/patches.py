@@ -0,0 +1,368 @@
+from functools import lru_cache
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tomllib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.envelopes import ADSREnvelope
+from src.helpers.describe import type_name
+from src.helpers.utils import note_to_hz
+from src.modifier import (
+    ConvolutionReverb,
+    Delay,
+    Filter,
+    Modifier,
+    ModulatedDelay,
+    ModulatedFilter,
+    ModulatedPanner,
+    ModulatedVolume,
+    Panner,
+    Volume,
+)
+from src.modulator import ControlRate, ModulatedOscillator
+from src.oscillators.noise import FBMNoise, PinkNoise, WhiteNoise
+from src.oscillators.oscillators import (
+    SawtoothOscillator,
+    SineOscillator,
+    SquareOscillator,
+    TriangleOscillator,
+)
+from src.oscillators.plucked_string import PluckedString, PluckedStrings
+from src.oscillators.polyblep import (
+    PolyBLEPSawtoothOscillator,
+    PolyBLEPSquareOscillator,
+    PolyBLEPTriangleOscillator,
+)
+from src.oscillators.unison import UnisonOscillator
+from src.oscillators.wavetable import WavetableOscillator
+from src.wave_chain import Chain, WaveAdder
+
+# Declarative patches, a JSON or TOML file describing the graph for one voice, e.g.
+#
+#   name = "sine_keys"
+#
+#   [graph]
+#   type = "modulated"
+#   amp_mod = "multiply"
+#   oscillator = { type = "sine", freq = "A4" }
+#   modulators = [{ type = "adsr", attack_duration = 0.01, release_duration = 0.3 }]
+#
+# Each node is a table with a type and the constructor arguments of its class, by name
+# Child nodes, lists of them and modulation functions are fields too, e.g. a chain's modifiers
+# freq also takes a note name, and mod functions are named built-ins from MOD_FUNCTIONS
+
+# Bump when the format or the classes it builds change, so compiled patches are rebuilt
+FORMAT_VERSION = 4
+
+
+class PatchError(ValueError):
+    pass
+
+
+# Built-in modulation functions, all of them work on whole blocks
+def _multiply(init_val: float, val: float) -> float:
+    return init_val * val
+
+
+def _add(init_val: float, val: float, amount: float = 1.0) -> float:
+    return init_val + amount * val
+
+
+def _relative(
+    init_val: float, val: float, amount: float = 1.0, center: float = 0.0
+) -> float:
+    return init_val * (1 + amount * (val - center))
+
+
+MOD_FUNCTIONS: Dict[str, Callable[..., float]] = {
+    "multiply": _multiply,
+    "add": _add,
+    "relative": _relative,
+}
+
+
+# A named built-in mod function with its parameters, picklable unlike a lambda
+class ModFunction:
+    array_mod = True
+
+    def __init__(self, name: str, **params: float) -> None:
+        self.name = name
+        self.params = params
+        self._func = MOD_FUNCTIONS[name]
+
+    def __call__(self, init_val: float, val: float) -> float:
+        return self._func(init_val, val, **self.params)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": type_name(self), "name": self.name, "params": self.params}
+
+
+# Fields of a node that hold other nodes or mod functions, anything else is a plain value
+NODE, NODES, MODIFIERS, FILTER, MOD = "node", "nodes", "modifiers", "filter", "mod"
+
+NODE_TYPES: Dict[str, Tuple[type, Dict[str, str]]] = {
+    "sine": (SineOscillator, {}),
+    "square": (SquareOscillator, {}),
+    "sawtooth": (SawtoothOscillator, {}),
+    "triangle": (TriangleOscillator, {}),
+    "polyblep_square": (PolyBLEPSquareOscillator, {}),
+    "polyblep_sawtooth": (PolyBLEPSawtoothOscillator, {}),
+    "polyblep_triangle": (PolyBLEPTriangleOscillator, {}),
+    "wavetable": (WavetableOscillator, {}),
+    "white_noise": (WhiteNoise, {}),
+    "pink_noise": (PinkNoise, {}),
+    "fbm_noise": (FBMNoise, {}),
+    "unison": (UnisonOscillator, {"oscillator": NODE}),
+    "plucked_string": (PluckedString, {}),
+    "plucked_strings": (PluckedStrings, {}),
+    "adsr": (ADSREnvelope, {}),
+    "control_rate": (ControlRate, {"modulator": NODE}),
+    "modulated": (
+        ModulatedOscillator,
+        {
+            "oscillator": NODE,
+            "modulators": NODES,
+            "amp_mod": MOD,
+            "freq_mod": MOD,
+            "phase_mod": MOD,
+        },
+    ),
+    "adder": (WaveAdder, {"generators": NODES}),
+    "chain": (Chain, {"generator": NODE, "modifiers": MODIFIERS}),
+    "panner": (Panner, {}),
+    "volume": (Volume, {}),
+    "modulated_panner": (ModulatedPanner, {"modulator": NODE}),
+    "modulated_volume": (ModulatedVolume, {"modulator": NODE}),
+    "filter": (Filter, {}),
+    "reverb": (ConvolutionReverb, {}),
+    "delay": (Delay, {"feedback_filter": FILTER}),
+    "modulated_delay": (
+        ModulatedDelay,
+        {"modulator": NODE, "feedback_filter": FILTER},
+    ),
+    "modulated_filter": (
+        ModulatedFilter,
+        {
+            "cutoff_modulator": NODE,
+            "resonance_modulator": NODE,
+            "cutoff_mod": MOD,
+            "resonance_mod": MOD,
+        },
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _parameters(cls: type) -> Tuple[inspect.Parameter, ...]:
+    return tuple(inspect.signature(cls.__init__).parameters.values())[1:]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def build_mod(spec: Any, path: str) -> ModFunction:
+    if isinstance(spec, str):
+        spec = {"name": spec}
+    if not isinstance(spec, dict):
+        raise PatchError(f"{path}: expected a mod function name or table")
+
+    params = dict(spec)
+    name = params.pop("name", None)
+    if name not in MOD_FUNCTIONS:
+        raise PatchError(
+            f"{path}: unknown mod function {name!r}, expected one of {sorted(MOD_FUNCTIONS)}"
+        )
+
+    allowed = list(inspect.signature(MOD_FUNCTIONS[name]).parameters)[2:]
+    for key, value in params.items():
+        if key not in allowed:
+            raise PatchError(f"{path}.{key}: '{name}' only takes {allowed}")
+        if not _is_number(value):
+            raise PatchError(f"{path}.{key}: expected a number")
+    return ModFunction(name, **params)
+
+
+def _value(value: Any, param: inspect.Parameter, path: str) -> Any:
+    default = param.default
+    if param.name == "freq" and isinstance(value, str):
+        try:
+            return float(note_to_hz(value))
+        except ValueError as err:
+            raise PatchError(f"{path}: {err}") from err
+
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise PatchError(f"{path}: expected true or false")
+    elif _is_number(default):
+        if not _is_number(value):
+            raise PatchError(f"{path}: expected a number")
+    elif isinstance(default, str):
+        if not isinstance(value, str):
+            raise PatchError(f"{path}: expected a string")
+    elif isinstance(default, tuple):
+        if not isinstance(value, list) or len(value) != len(default):
+            raise PatchError(f"{path}: expected a list of {len(default)} values")
+        if not all(_is_number(v) for v in value):
+            raise PatchError(f"{path}: expected numbers")
+        return tuple(value)
+    return value
+
+
+def _children(value: Any, kind: str, path: str) -> Any:
+    if kind == MOD:
+        return build_mod(value, path)
+    if kind == NODE:
+        node = build_node(value, path)
+        if isinstance(node, Modifier):
+            raise PatchError(f"{path}: a modifier can't be used as a generator")
+        return node
+    if kind == FILTER:
+        node = build_node(value, path)
+        if not isinstance(node, Filter):
+            raise PatchError(f"{path}: expected a filter")
+        return node
+
+    if not isinstance(value, list):
+        raise PatchError(f"{path}: expected a list")
+    nodes = [build_node(v, f"{path}[{i}]") for i, v in enumerate(value)]
+    for i, node in enumerate(nodes):
+        if (kind == MODIFIERS) != isinstance(node, Modifier):
+            expected = "a modifier" if kind == MODIFIERS else "a generator"
+            raise PatchError(f"{path}[{i}]: expected {expected}")
+    return nodes
+
+
+# Builds and validates the graph of one node table, path names the node in error messages
+def build_node(spec: Any, path: str = "graph") -> Any:
+    if not isinstance(spec, dict):
+        raise PatchError(f"{path}: expected a table")
+    kind = spec.get("type")
+    if not isinstance(kind, str) or kind not in NODE_TYPES:
+        raise PatchError(
+            f"{path}.type: unknown node type {kind!r}, expected one of {sorted(NODE_TYPES)}"
+        )
+
+    cls, children = NODE_TYPES[kind]
+    params = _parameters(cls)
+    names = {param.name for param in params}
+    for key in spec:
+        if key != "type" and key not in names:
+            raise PatchError(f"{path}.{key}: '{kind}' has no field '{key}'")
+
+    values = {}
+    for param in params:
+        field_path = f"{path}.{param.name}"
+        if param.name in spec:
+            value = spec[param.name]
+            if param.name in children:
+                values[param.name] = _children(value, children[param.name], field_path)
+            else:
+                values[param.name] = _value(value, param, field_path)
+        elif param.default is param.empty and param.kind != param.VAR_POSITIONAL:
+            raise PatchError(f"{path}: '{kind}' needs '{param.name}'")
+
+    if kind == "modulated" and not values.get("modulators"):
+        if any(values.get(mod) for mod in ("amp_mod", "freq_mod", "phase_mod")):
+            raise PatchError(f"{path}.modulators: mod functions need a modulator")
+
+    args: List[Any] = []
+    kwargs: Dict[str, Any] = {}
+    for param in params:
+        if param.kind == param.VAR_POSITIONAL:
+            args.extend(values.get(param.name, []))
+        elif param.kind == param.KEYWORD_ONLY:
+            if param.name in values:
+                kwargs[param.name] = values[param.name]
+        else:
+            args.append(values.get(param.name, param.default))
+
+    try:
+        return cls(*args, **kwargs)
+    except (TypeError, ValueError) as err:
+        raise PatchError(f"{path}: {err}") from err
+
+
+# A patch is a table with a graph and an optional name
+def parse_patch(data: Any, source: str = "<patch>") -> Any:
+    if not isinstance(data, dict) or "graph" not in data:
+        raise PatchError(f"{source}: a patch needs a graph")
+    for key in data:
+        if key not in ("name", "graph"):
+            raise PatchError(f"{source}: unknown field '{key}'")
+    try:
+        return build_node(data["graph"])
+    except PatchError as err:
+        raise PatchError(f"{source}: {err}") from err
+
+
+def read_patch_file(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        return _decode(f.read(), path)
+
+
+def _decode(raw: bytes, path: str) -> Dict[str, Any]:
+    try:
+        if path.endswith(".toml"):
+            return tomllib.loads(raw.decode("utf-8"))
+        return json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as err:
+        raise PatchError(f"{path}: {err}") from err
+
+
+# A validated patch kept as a pickled graph, calling it unpickles a fresh copy
+# so building a voice skips parsing and validation, it works anywhere a Patch does
+class CompiledPatch:
+    def __init__(self, name: str, graph: Any) -> None:
+        self.name = name
+        self._data = pickle.dumps(graph, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __call__(self) -> Any:
+        return pickle.loads(self._data)
+
+
+def compile_patch(
+    data: Dict[str, Any], name: str, source: str = "<patch>"
+) -> CompiledPatch:
+    return CompiledPatch(data.get("name", name), parse_patch(data, source))
+
+
+# Loads a patch file, with a cache_dir the compiled patch is kept there
+# keyed by the file's contents, so unchanged files skip parsing and validation next time
+def load_patch(path: str, cache_dir: Optional[str] = None) -> CompiledPatch:
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, "rb") as f:
+        raw = f.read()
+    if cache_dir is None:
+        return compile_patch(_decode(raw, path), name, path)
+
+    key = hashlib.sha256(
+        f"{FORMAT_VERSION}:{name}:{path.endswith('.toml')}:".encode() + raw
+    )
+    cache_path = os.path.join(cache_dir, f"{key.hexdigest()}.patch")
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    patch = compile_patch(_decode(raw, path), name, path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written to a temporary file first so a concurrent load never reads half a file
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(patch, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, cache_path)
+    return patch
+
+
+# Every .json and .toml patch in a directory, by patch name
+def load_patches(
+    directory: str, cache_dir: Optional[str] = None
+) -> Dict[str, CompiledPatch]:
+    patches = {}
+    for fname in sorted(os.listdir(directory)):
+        if fname.endswith((".json", ".toml")):
+            patch = load_patch(os.path.join(directory, fname), cache_dir)
+            patches[patch.name] = patch
+    return patches
@@ -0,0 +1,294 @@
+from dataclasses import dataclass
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+import numpy as np
+import numpy.typing as npt
+from src.modulator import pull_block
+from src.wav_writer import WavWriter
+
+
+# Single producer, single consumer ring of audio frames
+# Only the producer moves _write and only the consumer moves _read, so neither side needs a lock
+class RingBuffer:
+    def __init__(self, capacity: int, channels: int = 1) -> None:
+        self.capacity = capacity
+        self.channels = channels
+        shape = (capacity,) if channels == 1 else (capacity, channels)
+        self._buffer: npt.NDArray[np.float64] = np.zeros(shape)
+        # Total frames written and read, the difference is the fill level
+        self._write = 0
+        self._read = 0
+
+    @property
+    def available(self) -> int:
+        return self._write - self._read
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.available
+
+    def write(self, block: npt.NDArray[np.float64]) -> int:
+        n = min(len(block), self.free)
+        start = self._write % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start : start + first] = block[:first]
+        self._buffer[: n - first] = block[first:n]
+        self._write += n
+        return n
+
+    def read_into(self, out: npt.NDArray[np.float64]) -> int:
+        n = min(len(out), self.available)
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._buffer[start : start + first]
+        out[first:n] = self._buffer[: n - first]
+        self._read += n
+        return n
+
+
+@dataclass
+class EngineStats:
+    callbacks: int = 0
+    underruns: int = 0
+    # Fraction of the ring buffer filled after the last callback
+    fill_level: float = 0.0
+    # Difference between the actual and expected time between callbacks, in seconds
+    max_jitter: float = 0.0
+    mean_jitter: float = 0.0
+
+
+# Sinks own the audio callback, they call engine.callback with a buffer to fill whenever they need audio
+class AudioSink:
+    clock: Callable[[], float] = staticmethod(time.perf_counter)
+
+    def start(self, engine: "RealtimeEngine") -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+# Advances only when told to, so callback timing is reproducible in tests
+class SimulatedClock:
+    def __init__(self, start: float = 0.0) -> None:
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+# Sink without a sound card, callbacks are driven by pump() against a simulated clock
+class NullSink(AudioSink):
+    _engine: Optional["RealtimeEngine"]
+
+    def __init__(self, clock: Optional[SimulatedClock] = None) -> None:
+        self.clock = clock or SimulatedClock()
+        self._engine = None
+        self._out: Optional[npt.NDArray[np.float64]] = None
+
+    def start(self, engine: "RealtimeEngine") -> None:
+        self._engine = engine
+        shape = (
+            (engine.block_size,)
+            if engine.channels == 1
+            else (engine.block_size, engine.channels)
+        )
+        self._out = np.zeros(shape)
+
+    def stop(self) -> None:
+        self._engine = None
+
+    def _consume(self, out: npt.NDArray[np.float64]) -> None:
+        pass
+
+    # Runs n callbacks, one block apart on the simulated clock
+    def pump(self, n: int = 1) -> None:
+        if self._engine is None or self._out is None:
+            raise RuntimeError("sink has not been started")
+
+        for _ in range(n):
+            self._engine.callback(self._out)
+            self._consume(self._out)
+            if isinstance(self.clock, SimulatedClock):
+                self.clock.advance(self._engine.block_size / self._engine.sample_rate)
+
+
+# Null sink that records every callback to a WAV file
+class FileSink(NullSink):
+    _writer: Optional[WavWriter]
+
+    def __init__(
+        self,
+        fname: str,
+        bit_depth: int = 16,
+        clock: Optional[SimulatedClock] = None,
+    ) -> None:
+        super().__init__(clock)
+        self.fname = fname
+        self.bit_depth = bit_depth
+        self._writer = None
+
+    def start(self, engine: "RealtimeEngine") -> None:
+        super().start(engine)
+        self._writer = WavWriter(
+            self.fname, engine.sample_rate, engine.channels, self.bit_depth
+        )
+
+    def stop(self) -> None:
+        super().stop()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _consume(self, out: npt.NDArray[np.float64]) -> None:
+        if self._writer is not None:
+            self._writer.write(out)
+
+
+# Plays through the sound card, sounddevice is only imported when the stream starts
+class SoundDeviceSink(AudioSink):
+    def __init__(self, device: Optional[Any] = None) -> None:
+        self.device = device
+        self._stream: Optional[Any] = None
+        self._out: Optional[npt.NDArray[np.float64]] = None
+
+    def start(self, engine: "RealtimeEngine") -> None:
+        import sounddevice
+
+        self._out = np.zeros((engine.block_size, engine.channels))
+        out = self._out if engine.channels == 2 else self._out[:, 0]
+
+        def stream_callback(outdata, frames, time_info, status) -> None:
+            engine.callback(out[:frames])
+            outdata[:] = self._out[:frames]
+
+        self._stream = sounddevice.OutputStream(
+            samplerate=engine.sample_rate,
+            blocksize=engine.block_size,
+            channels=engine.channels,
+            dtype="float32",
+            device=self.device,
+            callback=stream_callback,
+        )
+        self._stream.start()
+
+    def stop(self) -> None:
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+# Plays a generator graph in real time
+# A producer thread renders blocks into the ring buffer ahead of the sink,
+# the sink callback only copies out of the ring so it never waits on rendering
+class RealtimeEngine:
+    ring: Optional[RingBuffer]
+
+    def __init__(
+        self,
+        gen: Iterator,
+        sink: AudioSink,
+        sample_rate: int = 44100,
+        block_size: int = 256,
+        buffer_blocks: int = 8,
+    ) -> None:
+        self.gen = gen
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.buffer_blocks = buffer_blocks
+        self.channels = 1
+        self.stats = EngineStats()
+        self.ring = None
+
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        # Set by the callback whenever it frees space in the ring
+        self._space = threading.Event()
+        self._last_callback: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def clock(self) -> Callable[[], float]:
+        return self.sink.clock
+
+    def start(self) -> None:
+        iter(self.gen)
+
+        # The first block decides the channel layout, then the ring is filled before playback starts
+        block = pull_block(self.gen, self.block_size)
+        self.channels = 1 if block.ndim == 1 else block.shape[1]
+        self.ring = RingBuffer(self.block_size * self.buffer_blocks, self.channels)
+        self.ring.write(block)
+        while self.ring.free >= self.block_size:
+            self.ring.write(pull_block(self.gen, self.block_size))
+
+        self.stats = EngineStats()
+        self._last_callback = None
+        self._running = True
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+        self.sink.start(self)
+
+    def stop(self) -> None:
+        self.sink.stop()
+        self._running = False
+        self._space.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _produce(self) -> None:
+        assert self.ring is not None
+        block_duration = self.block_size / self.sample_rate
+
+        try:
+            while self._running:
+                if self.ring.free >= self.block_size:
+                    self.ring.write(pull_block(self.gen, self.block_size))
+                    continue
+
+                self._space.clear()
+                if self.ring.free < self.block_size:
+                    self._space.wait(block_duration)
+        except Exception as err:
+            self.error = err
+            self._running = False
+
+    def callback(self, out: npt.NDArray[np.float64]) -> None:
+        if self.ring is None:
+            out.fill(0.0)
+            return
+
+        now = self.clock()
+        if self._last_callback is not None:
+            expected = len(out) / self.sample_rate
+            jitter = abs((now - self._last_callback) - expected)
+            self.stats.max_jitter = max(self.stats.max_jitter, jitter)
+            self.stats.mean_jitter += (jitter - self.stats.mean_jitter) / (
+                self.stats.callbacks
+            )
+        self._last_callback = now
+        self.stats.callbacks += 1
+
+        read = self.ring.read_into(out)
+        if read < len(out):
+            out[read:] = 0.0
+            self.stats.underruns += 1
+
+        self.stats.fill_level = self.ring.available / self.ring.capacity
+        self._space.set()
+
+    # Blocks until the producer has filled the ring, useful before pumping a simulated sink
+    def wait_filled(self, timeout: float = 1.0) -> bool:
+        deadline = time.perf_counter() + timeout
+        while self.ring is not None and self.ring.free >= self.block_size:
+            if not self._running or time.perf_counter() > deadline:
+                return False
+            time.sleep(self.block_size / self.sample_rate / 4)
+        return True
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+import os
+import threading
+from typing import Any, Optional
+import numpy as np
+import numpy.typing as npt
+from src.helpers.describe import describe_node, digest
+from src.render_plan import compile_graph
+
+
+# Content addressed cache of rendered graphs, for sounds rendered again and again, e.g. one-shots
+# A render is keyed by the graph description, its length, sample rate and when it's released,
+# so equal requests share one buffer however the graph objects were built
+# Buffers are kept in memory up to max_bytes, least recently used first out
+# With a directory they are also saved as .npy files and returned memory mapped,
+# which lets other processes and later runs reuse them
+class RenderCache:
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        directory: Optional[str] = None,
+        block_size: int = 4096,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.block_size = block_size
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._buffers: "OrderedDict[str, npt.NDArray[np.float64]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _frames(seconds: float, sample_rate: int) -> int:
+        return int(seconds * sample_rate)
+
+    def key(
+        self,
+        gen: Any,
+        duration: float,
+        sample_rate: int = 44100,
+        release_at: Optional[float] = None,
+    ) -> str:
+        return digest(
+            {
+                "graph": describe_node(gen),
+                "frames": self._frames(duration, sample_rate),
+                "sample_rate": sample_rate,
+                "release": (
+                    None
+                    if release_at is None
+                    else self._frames(release_at, sample_rate)
+                ),
+            }
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _remember(self, key: str, buf: npt.NDArray[np.float64]) -> None:
+        with self._lock:
+            if key not in self._buffers:
+                self._buffers[key] = buf
+                self.nbytes += buf.nbytes
+            self._buffers.move_to_end(key)
+            while self.nbytes > self.max_bytes and len(self._buffers) > 1:
+                _, evicted = self._buffers.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    # The cached buffer for a key, or None, buffers are read only as they're shared
+    def get(self, key: str) -> Optional[npt.NDArray[np.float64]]:
+        with self._lock:
+            if key in self._buffers:
+                self._buffers.move_to_end(key)
+                return self._buffers[key]
+
+        if self.directory is not None and os.path.exists(self._path(key)):
+            buf = np.load(self._path(key), mmap_mode="r")
+            self._remember(key, buf)
+            return buf
+        return None
+
+    def put(self, key: str, buf: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        if self.directory is not None:
+            # Written to a temporary file first so readers never see half a file
+            path = self._path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, buf)
+            os.replace(tmp, path)
+            buf = np.load(path, mmap_mode="r")
+        else:
+            buf.flags.writeable = False
+
+        self._remember(key, buf)
+        return buf
+
+    # Renders duration seconds of gen from its start, or returns the cached render
+    # release_at triggers the release that many seconds in
+    def render(
+        self,
+        gen: Any,
+        duration: float,
+        sample_rate: int = 44100,
+        release_at: Optional[float] = None,
+    ) -> npt.NDArray[np.float64]:
+        key = self.key(gen, duration, sample_rate, release_at)
+        buf = self.get(key)
+        if buf is not None:
+            self.hits += 1
+            return buf
+
+        self.misses += 1
+        frames = self._frames(duration, sample_rate)
+        release = None if release_at is None else self._frames(release_at, sample_rate)
+
+        plan = iter(compile_graph(gen, self.block_size))
+        out = np.empty((frames,) if plan.channels == 1 else (frames, 2))
+        for pos in range(0, frames, self.block_size):
+            n = min(self.block_size, frames - pos)
+            if release is not None and pos <= release < pos + n:
+                plan.trigger_release(release - pos)
+            out[pos : pos + n] = plan.next_block(n)
+
+        return self.put(key, out)
+
+    # Drops the memory tier, and the saved files as well if disk is set
+    def clear(self, disk: bool = False) -> None:
+        with self._lock:
+            self._buffers.clear()
+            self.nbytes = 0
+
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,295 @@
+from collections.abc import Iterator
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+import numpy.typing as npt
+from src.modulator import ModulatedOscillator, pull_block
+from src.wave_chain import Chain, SilenceWatch, WaveAdder, can_end
+
+
+# The steps rendering a branch of the graph that can end, e.g. one note of a chord or the source of a chain
+# Once the branch has finished its steps are skipped and its output is held at silence
+class _Branch:
+    def __init__(
+        self,
+        node: Any,
+        steps: List[Callable[[int], None]],
+        out: npt.NDArray[np.float64],
+    ) -> None:
+        self.steps = steps
+        self.out = out
+        self.live = True
+        self._watch = SilenceWatch(node)
+
+    def __call__(self, n: int) -> None:
+        if not self.live:
+            self.out[:n] = 0.0
+            return
+
+        for step in self.steps:
+            step(n)
+        if self._watch.finished(self.out[:n], n):
+            self.live = False
+
+    def reset(self) -> None:
+        self.live = True
+        self._watch.reset()
+        for step in self.steps:
+            if isinstance(step, _Branch):
+                step.reset()
+
+
+# Steps rendered and skipped, a finished branch counts all the steps inside it as skipped
+def _count(steps: List[Callable[[int], None]]) -> Tuple[int, int]:
+    active = pruned = 0
+    for step in steps:
+        if not isinstance(step, _Branch):
+            active += 1
+        elif step.live:
+            a, p = _count(step.steps)
+            active += a
+            pruned += p
+        else:
+            pruned += sum(_count(step.steps))
+    return active, pruned
+
+
+# A render plan is a generator graph flattened into a list of block steps
+# Each node renders into its own preallocated buffer, children always run before their parents
+# Node types, channel layouts and modifier order are resolved once when compiling,
+# so rendering a block is a flat loop over the steps
+# Branches that can end, the children of a WaveAdder and the generator of a Chain, are grouped
+# so once one has ended and gone silent the whole group is skipped
+class RenderPlan:
+    def __init__(
+        self,
+        root: Any,
+        steps: List[Callable[[int], None]],
+        buffers: List[npt.NDArray[np.float64]],
+        output: int,
+        block_size: int,
+    ) -> None:
+        self.root = root
+        self.steps = steps
+        self.buffers = buffers
+        self.block_size = block_size
+        self._output = buffers[output]
+
+    @property
+    def channels(self) -> int:
+        return 1 if self._output.ndim == 1 else 2
+
+    @property
+    def ended(self) -> bool:
+        return getattr(self.root, "ended", False)
+
+    # Node steps rendered by the last block
+    @property
+    def active(self) -> int:
+        return _count(self.steps)[0]
+
+    # Node steps skipped because their branch has finished
+    @property
+    def pruned(self) -> int:
+        return _count(self.steps)[1]
+
+    def trigger_release(self, offset: int = 0) -> None:
+        self.root.trigger_release(offset)
+
+    def __iter__(self) -> "RenderPlan":
+        iter(self.root)
+        for step in self.steps:
+            if isinstance(step, _Branch):
+                step.reset()
+        return self
+
+    def __next__(self):
+        val = self.next_block(1)[0]
+        return tuple(val) if self.channels == 2 else float(val)
+
+    # The returned block is a view of the output buffer, it is overwritten by the next call
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        if n > self.block_size:
+            return np.concatenate(
+                [
+                    self.next_block(min(self.block_size, n - pos)).copy()
+                    for pos in range(0, n, self.block_size)
+                ]
+            )
+
+        for step in self.steps:
+            step(n)
+        return self._output[:n]
+
+
+class _Compiler:
+    def __init__(self, block_size: int) -> None:
+        self.block_size = block_size
+        self.steps: List[Callable[[int], None]] = []
+        self.buffers: List[npt.NDArray[np.float64]] = []
+        # Nodes shared between branches are only rendered once
+        self._compiled: Dict[int, int] = {}
+        # Nodes in the order they were compiled, and those reached more than once
+        self._order: List[int] = []
+        self._shared: Set[int] = set()
+        # Candidate branches, (node, output, first step, end step, first node, end node)
+        self._branches: List[Tuple[Any, int, int, int, int, int]] = []
+
+    def _buffer(self, channels: int) -> int:
+        shape = (self.block_size,) if channels == 1 else (self.block_size, 2)
+        self.buffers.append(np.zeros(shape))
+        return len(self.buffers) - 1
+
+    def _channels(self, idx: int) -> int:
+        return 1 if self.buffers[idx].ndim == 1 else 2
+
+    def compile(self, node: Any) -> int:
+        key = id(node)
+        if key in self._compiled:
+            self._shared.add(key)
+        else:
+            if isinstance(node, WaveAdder):
+                idx = self._compile_adder(node)
+            elif isinstance(node, Chain):
+                idx = self._compile_chain(node)
+            elif isinstance(node, ModulatedOscillator):
+                idx = self._compile_modulated(node)
+            else:
+                idx = self._compile_leaf(node)
+            self._compiled[key] = idx
+            self._order.append(key)
+        return self._compiled[key]
+
+    # Compiles a node that may be pruned on its own once it has ended
+    def _compile_branch(self, node: Any) -> int:
+        first_step, first_node = len(self.steps), len(self._order)
+        idx = self.compile(node)
+        if can_end(node):
+            self._branches.append(
+                (node, idx, first_step, len(self.steps), first_node, len(self._order))
+            )
+        return idx
+
+    # Groups the steps of each branch, a branch can only be skipped if nothing outside it
+    # reads any of its nodes, i.e. it compiled every node it uses and none of them are shared
+    def grouped_steps(self) -> List[Callable[[int], None]]:
+        # Branches covering the same steps are one branch, the outermost node's
+        ranges: Dict[Tuple[int, int], Tuple[Any, int]] = {}
+        for node, idx, start, end, first, last in self._branches:
+            if end > start and not self._shared.intersection(self._order[first:last]):
+                ranges[(start, end)] = (node, idx)
+
+        # Branches either nest or don't overlap, so steps can be grouped from the outside in
+        def group(start: int, end: int) -> List[Callable[[int], None]]:
+            steps: List[Callable[[int], None]] = []
+            whole = (start, end)
+            i = start
+            while i < end:
+                inner = [r for r in ranges if r[0] == i and r[1] <= end and r != whole]
+                if inner:
+                    outer = max(inner, key=lambda r: r[1])
+                    node, idx = ranges[outer]
+                    steps.append(_Branch(node, group(*outer), self.buffers[idx]))
+                    i = outer[1]
+                else:
+                    steps.append(self.steps[i])
+                    i += 1
+            return steps
+
+        return group(0, len(self.steps))
+
+    def _compile_leaf(self, node: Any, channels: Optional[int] = None) -> int:
+        # Generators are mono unless they say otherwise, e.g. a stereo UnisonOscillator
+        if channels is None:
+            channels = getattr(node, "channels", 1)
+        out = self.buffers[self._buffer(channels)]
+
+        def step(n: int) -> None:
+            out[:n] = pull_block(node, n)
+
+        self.steps.append(step)
+        return len(self.buffers) - 1
+
+    def _compile_modulated(self, node: ModulatedOscillator) -> int:
+        mods = [self.buffers[self.compile(mod)] for mod in node.modulators]
+        idx = self._buffer(getattr(node.oscillator, "channels", 1))
+        out = self.buffers[idx]
+
+        def step(n: int) -> None:
+            out[:n] = node.modulate_block(n, [mod[:n] for mod in mods])
+
+        self.steps.append(step)
+        return idx
+
+    def _compile_adder(self, node: WaveAdder) -> int:
+        children = [self._compile_branch(gen) for gen in node.generators]
+        idx = self._buffer(2 if node.stereo else 1)
+        out = self.buffers[idx]
+        # Resolve how each child is mixed into the output layout
+        channels = self._channels(idx)
+        same = [self.buffers[c] for c in children if self._channels(c) == channels]
+        upmix = [self.buffers[c] for c in children if self._channels(c) < channels]
+        downmix = [self.buffers[c] for c in children if self._channels(c) > channels]
+        count = len(children)
+
+        def step(n: int) -> None:
+            o = out[:n]
+            o.fill(0.0)
+            for child in same:
+                o += child[:n]
+            for child in upmix:
+                o += child[:n, None]
+            for child in downmix:
+                o += child[:n].mean(axis=1)
+            o /= count
+
+        self.steps.append(step)
+        return idx
+
+    def _compile_chain(self, node: Chain) -> int:
+        idx = self._compile_branch(node.generator)
+
+        for mod in node.modifiers:
+            if not hasattr(mod, "apply_block"):
+                raise TypeError(f"modifier '{type(mod).__name__}' has no block path")
+
+            ctrl: Optional[npt.NDArray[np.float64]] = None
+            if isinstance(mod, Iterator):
+                # Control signals of modulated modifiers are mono unless they say otherwise
+                channels = getattr(mod, "control_channels", 1)
+                ctrl = self.buffers[self._compile_leaf(mod, channels=channels)]
+
+            channels = getattr(mod, "channels", None) or self._channels(idx)
+            idx = self._modifier_step(mod, self.buffers[idx], ctrl, channels)
+
+        return idx
+
+    def _modifier_step(
+        self,
+        mod: Any,
+        inp: npt.NDArray[np.float64],
+        ctrl: Optional[npt.NDArray[np.float64]],
+        channels: int,
+    ) -> int:
+        idx = self._buffer(channels)
+        out = self.buffers[idx]
+
+        if ctrl is None:
+
+            def step(n: int) -> None:
+                out[:n] = mod.apply_block(inp[:n])
+
+        else:
+
+            def step(n: int) -> None:
+                out[:n] = mod.apply_block(inp[:n], ctrl[:n])
+
+        self.steps.append(step)
+        return idx
+
+
+# Walks a Chain/WaveAdder/ModulatedOscillator graph once and flattens it into a RenderPlan
+def compile_graph(gen: Any, block_size: int = 512) -> RenderPlan:
+    compiler = _Compiler(block_size)
+    output = compiler.compile(gen)
+    steps = compiler.grouped_steps()
+    return RenderPlan(gen, steps, compiler.buffers, output, block_size)
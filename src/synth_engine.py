@@ -1,4 +1,4 @@
-from librosa import note_to_hz
+from src.helpers.utils import note_to_hz
 from src.oscillators.base_oscillator import Generator
 from src.oscillators.oscillators import (
     SineOscillator,
@@ -6,15 +6,16 @@ from src.oscillators.oscillators import (
     SquareOscillator,
     SawtoothOscillator,
 )
+from src.oscillators.unison import UnisonOscillator
 from src.wave_chain import Chain, WaveAdder
-from src.modulator import ModulatedOscillator
+from src.modulator import ModulatedOscillator, array_mod, pull_block
 from src.modifier import Panner, Volume, ModulatedVolume, ModulatedPanner
 from src.envelopes import ADSREnvelope
-from typing import Union, Optional
+from src.render_plan import compile_graph
+from src.wav_writer import WavWriter
+from typing import Iterator, Union, Optional
 import numpy as np
 import numpy.typing as npt
-import matplotlib.pyplot as plt
-from scipy.io import wavfile
 
 
 class SynthEngine:
@@ -35,15 +36,34 @@ class SynthEngine:
         amp: float = 0.1,
         sample_rate: int = 44100,
     ) -> None:
-        wav_arr: npt.NDArray[np.float64] = np.array(wav)
-        wav_arr = np.int16(wav_arr * amp * (2**15 - 1))
+        wav_arr: npt.NDArray[np.float64] = np.asarray(wav, dtype=np.float64)
 
         if wav2 is not None:
-            wav2_arr: npt.NDArray[np.float64] = np.array(wav2)
-            wav2_arr = np.int16(wav2_arr * amp * (2**15 - 1))
-            wav = np.stack([wav, wav2]).T
+            wav_arr = np.column_stack([wav_arr, np.asarray(wav2, dtype=np.float64)])
 
-        wavfile.write(fname, sample_rate, wav_arr)
+        channels = 1 if wav_arr.ndim == 1 else 2
+        with WavWriter(fname, sample_rate, channels) as writer:
+            writer.write(wav_arr * amp)
+
+    # Streams a generator to a WAV file a block at a time, memory use is bounded by block_size
+    # bit_depth is 16 or 24 for PCM ints, or 32 for floats
+    def render_to_file(
+        self,
+        gen: Iterator,
+        fname: str = "temp.wav",
+        amp: float = 0.1,
+        bit_depth: int = 16,
+        block_size: int = 4096,
+    ) -> None:
+        duration: int = int(self._sample_rate * self._sample_duration_sec)
+
+        block = pull_block(gen, min(block_size, duration))
+        channels = 1 if block.ndim == 1 else 2
+        with WavWriter(fname, self._sample_rate, channels, bit_depth) as writer:
+            writer.write(block * amp)
+            while writer.frames_written < duration:
+                n = min(block_size, duration - writer.frames_written)
+                writer.write(pull_block(gen, n) * amp)
 
     # If mono, single graph is plotted.
     # If stereo, we plot L, R and combined graphs
@@ -53,6 +73,9 @@ class SynthEngine:
         fname: str,
         title: str = "Waveform",
     ) -> None:
+        # matplotlib is slow to import and only needed for plots
+        import matplotlib.pyplot as plt
+
         wav_arr = np.array(wav)
         time_axis = np.linspace(0, self._sample_duration_sec, len(wav_arr))
 
@@ -96,13 +119,17 @@ class SynthEngine:
         plt.savefig(f"{fname}.png")
         plt.close()
 
-    def run(self) -> None:
+    # The instrument graph run() renders
+    def build_graph(self) -> Union[Chain, Generator]:
+        @array_mod
         def amp_mod(init_amp: float, env: float) -> float:
             return env * init_amp
 
+        @array_mod
         def freq_mod(init_freq, env, mod_amt=0.01, sustain_level=0.7):
             return init_freq + ((env - sustain_level) * init_freq * mod_amt)
 
+        @array_mod
         def simple_freq_mod(init_freq: float, val: float) -> float:
             return init_freq * val
 
@@ -172,10 +199,7 @@ class SynthEngine:
         #         amp_mod=amp_mod,
         #     ),
         #     Chain(
-        #         WaveAdder(
-        #             SineOscillator(note_to_hz("A2")),
-        #             SineOscillator(note_to_hz("A2") + 3),
-        #         ),
+        #         UnisonOscillator(SineOscillator(note_to_hz("A2")), voices=2, detune=47),
         #         ModulatedVolume(
         #             ADSREnvelope(0.01, 0.1, 0.4),
         #         ),
@@ -247,14 +271,17 @@ class SynthEngine:
             )
         )
 
-        iter(gen)
-        duration: int = self._sample_rate * int(self._sample_duration_sec)
+        return gen
 
-        # Generate float values for oscillators at x time in 0..duration
-        wav = [next(gen) for _ in range(duration)]
+    def run(self) -> None:
+        gen = self.build_graph()
 
         filename: str = "prelude_one"
-        self.plot_waveform(wav[:1000], fname=filename)
-        self.wave_to_file(wav, fname=f"{filename}.wav")
+        plan = iter(compile_graph(gen))
+        self.plot_waveform(plan.next_block(1000), fname=filename)
+
+        # Restart the graph and stream it to file in blocks
+        iter(plan)
+        self.render_to_file(plan, fname=f"{filename}.wav")
 
         print("DONE.")
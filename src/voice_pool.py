@@ -0,0 +1,252 @@
+import heapq
+import queue
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
+import numpy.typing as npt
+from src.helpers.utils import midi_to_hz
+from src.midi_input import CONTROL_CHANGE, NOTE_OFF, NOTE_ON, MidiEvent
+from src.modulator import ModulatedOscillator
+from src.oscillators.base_oscillator import Oscillator
+from src.oscillators.plucked_string import PluckedString
+from src.render_plan import RenderPlan, compile_graph
+from src.wave_chain import Chain, SilenceWatch, WaveAdder, can_end, tail
+
+# A patch builds the generator graph for one voice, e.g.
+# lambda: Chain(ModulatedOscillator(SineOscillator(), ADSREnvelope(), amp_mod=amp_mod), Panner())
+# It needs something that ends, e.g. an envelope, or its voices could only be freed by stealing
+Patch = Callable[[], Any]
+
+STEAL_OLDEST = "oldest"
+STEAL_QUIETEST = "quietest"
+STEAL_RELEASED_FIRST = "released-first"
+
+# Controllers that release every sounding voice
+_ALL_NOTES_OFF = (120, 123)
+
+
+# Oscillators that set the pitch of a voice, modulators such as LFOs keep their own freq
+def _carriers(gen: Any) -> List[Union[Oscillator, PluckedString]]:
+    if isinstance(gen, (Oscillator, PluckedString)):
+        return [gen]
+    if isinstance(gen, ModulatedOscillator):
+        return _carriers(gen.oscillator)
+    if isinstance(gen, WaveAdder):
+        return [osc for child in gen.generators for osc in _carriers(child)]
+    if isinstance(gen, Chain):
+        return _carriers(gen.generator)
+    return []
+
+
+class Voice:
+    plan: RenderPlan
+    note: Optional[int]
+
+    def __init__(self, gen: Any, base_freq: float, block_size: int) -> None:
+        self.gen = gen
+        self.plan = compile_graph(gen, block_size)
+        # Carriers keep their ratio to the patch's base freq, so detuned layers stay detuned
+        self.carriers = [(osc, osc.init_freq / base_freq) for osc in _carriers(gen)]
+        self.note = None
+        self.gain = 0.0
+        self.released = False
+        # Order the voice was started in, used to find the oldest voice
+        self.started = 0
+        # Peak level of the last rendered block, used to find the quietest voice
+        self.level = 0.0
+        # A voice with a delay or reverb is kept until its tail has rung out
+        self.watch = SilenceWatch(gen)
+        self.rung_out = tail(gen) == 0
+
+    def start(self, note: int, velocity: int, started: int) -> None:
+        freq = midi_to_hz(note)
+        for osc, ratio in self.carriers:
+            osc.init_freq = freq * ratio
+
+        iter(self.plan)
+        self.note = note
+        self.gain = velocity / 127
+        self.released = False
+        self.started = started
+        self.level = self.gain
+        self.watch.reset()
+        self.rung_out = tail(self.gen) == 0
+
+    def release(self, offset: int = 0) -> None:
+        self.plan.trigger_release(offset)
+        self.released = True
+
+    @property
+    def ended(self) -> bool:
+        return self.released and self.plan.ended and self.rung_out
+
+
+# Plays several notes at once from a fixed pool of voices built from one patch
+# Voice graphs are built and compiled up front and reused between notes
+# Only sounding voices are rendered, finished voices go back to the free list
+# Scheduled events split the block at their sample, so notes start and stop sample accurately
+class VoicePool:
+    def __init__(
+        self,
+        patch: Patch,
+        voices: int = 8,
+        steal: str = STEAL_OLDEST,
+        base_freq: float = 440.0,
+        block_size: int = 512,
+    ) -> None:
+        if steal not in (STEAL_OLDEST, STEAL_QUIETEST, STEAL_RELEASED_FIRST):
+            raise ValueError(f"unknown steal policy '{steal}'")
+
+        self.steal = steal
+        self.block_size = block_size
+        self.voices = [Voice(patch(), base_freq, block_size) for _ in range(voices)]
+        if not can_end(self.voices[0].gen):
+            raise ValueError("a pool patch needs something that ends, e.g. an envelope")
+        self.channels = self.voices[0].plan.channels
+        self.free: List[Voice] = list(self.voices)
+        self.active: List[Voice] = []
+        self.stolen = 0
+        # Latest value of each controller, 0..1
+        self.controls: Dict[int, float] = {}
+        # Samples rendered since the pool was iterated, the clock scheduled events use
+        self.sample_time = 0
+
+        self._started = 0
+        # Events arrive from other threads through the queue and wait in the heap until their block
+        self._incoming: "queue.SimpleQueue[MidiEvent]" = queue.SimpleQueue()
+        self._pending: List[Tuple[int, int, MidiEvent]] = []
+        self._scheduled = 0
+        shape = (block_size,) if self.channels == 1 else (block_size, self.channels)
+        self._mix: npt.NDArray[np.float64] = np.zeros(shape)
+        # Each voice's block scaled by its gain, the plan's own output is left as rendered
+        self._scaled: npt.NDArray[np.float64] = np.zeros(shape)
+
+    def _steal_voice(self) -> Voice:
+        self.stolen += 1
+        if self.steal == STEAL_QUIETEST:
+            return min(self.active, key=lambda v: v.level)
+        if self.steal == STEAL_RELEASED_FIRST:
+            released = [v for v in self.active if v.released]
+            if released:
+                return min(released, key=lambda v: v.started)
+        return min(self.active, key=lambda v: v.started)
+
+    def note_on(self, note: int, velocity: int = 127) -> None:
+        if velocity == 0:
+            self.note_off(note)
+            return
+
+        # Retrigger a voice already playing this note before taking a new one
+        voice = next(
+            (v for v in self.active if v.note == note and not v.released), None
+        )
+        if voice is None:
+            if self.free:
+                voice = self.free.pop()
+                self.active.append(voice)
+            else:
+                voice = self._steal_voice()
+
+        self._started += 1
+        voice.start(note, velocity, self._started)
+
+    def note_off(self, note: int, offset: int = 0) -> None:
+        for voice in self.active:
+            if voice.note == note and not voice.released:
+                voice.release(offset)
+
+    def trigger_release(self, offset: int = 0) -> None:
+        for voice in self.active:
+            if not voice.released:
+                voice.release(offset)
+
+    def control_change(self, control: int, value: int) -> None:
+        self.controls[control] = value / 127
+        if control in _ALL_NOTES_OFF:
+            self.trigger_release()
+
+    # Thread safe, the event is applied at its sample inside the block that contains it
+    def schedule(self, event: MidiEvent) -> None:
+        self._incoming.put(event)
+
+    def _apply(self, event: MidiEvent) -> None:
+        if event.kind == NOTE_ON:
+            self.note_on(event.data1, event.data2)
+        elif event.kind == NOTE_OFF:
+            self.note_off(event.data1)
+        elif event.kind == CONTROL_CHANGE:
+            self.control_change(event.data1, event.data2)
+
+    @property
+    def ended(self) -> bool:
+        return not self.active
+
+    # Node steps rendered and skipped across the sounding voices, notes of a chord or layers
+    # of a patch that have finished are skipped while the rest of the voice plays on
+    @property
+    def active_nodes(self) -> int:
+        return sum(voice.plan.active for voice in self.active)
+
+    @property
+    def pruned_nodes(self) -> int:
+        return sum(voice.plan.pruned for voice in self.active)
+
+    def __iter__(self) -> "VoicePool":
+        self.free = list(self.voices)
+        self.active = []
+        self.sample_time = 0
+        self._pending = []
+        return self
+
+    def __next__(self):
+        val = self.next_block(1)[0]
+        return tuple(val) if self.channels == 2 else float(val)
+
+    # Mixes all sounding voices, the returned block is overwritten by the next call
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        if n > self.block_size:
+            return np.concatenate(
+                [
+                    self.next_block(min(self.block_size, n - pos)).copy()
+                    for pos in range(0, n, self.block_size)
+                ]
+            )
+
+        while not self._incoming.empty():
+            event = self._incoming.get()
+            when = self.sample_time if event.sample is None else event.sample
+            self._scheduled += 1
+            heapq.heappush(self._pending, (when, self._scheduled, event))
+
+        mix = self._mix[:n]
+        mix.fill(0.0)
+        pos = 0
+        end = self.sample_time + n
+        while self._pending and self._pending[0][0] < end:
+            when, _, event = heapq.heappop(self._pending)
+            # Late events play as soon as possible
+            offset = max(when - self.sample_time, pos)
+            if offset > pos:
+                self._render(mix[pos:offset])
+                pos = offset
+            self._apply(event)
+
+        if pos < n:
+            self._render(mix[pos:])
+        self.sample_time = end
+
+        return mix
+
+    def _render(self, out: npt.NDArray[np.float64]) -> None:
+        n = len(out)
+        scaled = self._scaled[:n]
+        for voice in self.active:
+            block = np.multiply(voice.plan.next_block(n), voice.gain, out=scaled)
+            out += block
+            voice.level = float(np.abs(block).max())
+            if not voice.rung_out:
+                voice.rung_out = voice.watch.finished(block, n)
+
+        finished = [voice for voice in self.active if voice.ended]
+        for voice in finished:
+            self.active.remove(voice)
+            self.free.append(voice)
@@ -0,0 +1,104 @@
+import struct
+from typing import BinaryIO, Optional
+import numpy as np
+import numpy.typing as npt
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_HEADER_SIZE = 44
+
+
+# Writes a WAV file block by block, so memory use doesn't grow with the length of the render
+# The header is written with empty sizes up front and patched when the writer is closed
+# Bit depths 16 and 24 write PCM ints, 32 writes IEEE floats
+class WavWriter:
+    _file: Optional[BinaryIO]
+
+    def __init__(
+        self,
+        fname: str,
+        sample_rate: int = 44100,
+        channels: int = 1,
+        bit_depth: int = 16,
+    ) -> None:
+        if bit_depth not in (16, 24, 32):
+            raise ValueError("bit_depth must be 16, 24 or 32")
+        if channels not in (1, 2):
+            raise ValueError("channels must be 1 or 2")
+
+        self.fname = fname
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bit_depth = bit_depth
+        self.frames_written = 0
+        self._file = open(fname, "wb")
+        self._write_header()
+
+    def _write_header(self) -> None:
+        assert self._file is not None
+        fmt = _WAVE_FORMAT_IEEE_FLOAT if self.bit_depth == 32 else _WAVE_FORMAT_PCM
+        block_align = self.channels * self.bit_depth // 8
+        data_size = self.frames_written * block_align
+
+        self._file.write(
+            struct.pack(
+                "<4sI4s4sIHHIIHH4sI",
+                b"RIFF",
+                _HEADER_SIZE - 8 + data_size + data_size % 2,
+                b"WAVE",
+                b"fmt ",
+                16,
+                fmt,
+                self.channels,
+                self.sample_rate,
+                self.sample_rate * block_align,
+                block_align,
+                self.bit_depth,
+                b"data",
+                data_size,
+            )
+        )
+
+    def _to_bytes(self, block: npt.NDArray[np.float64]) -> bytes:
+        if self.bit_depth == 32:
+            return block.astype("<f4").tobytes()
+
+        clipped = np.clip(block, -1.0, 1.0)
+        if self.bit_depth == 16:
+            return (clipped * (2**15 - 1)).astype("<i2").tobytes()
+
+        # 24 bit samples are the low three bytes of a little endian int32
+        ints = (clipped * (2**23 - 1)).astype("<i4")
+        return ints.reshape(-1, 1).view(np.uint8)[:, :3].tobytes()
+
+    # Appends a block of float samples in -1..1, shape (n,) for mono or (n, 2) for stereo
+    def write(self, block: npt.NDArray[np.float64]) -> None:
+        if self._file is None:
+            raise ValueError("writer is closed")
+
+        block = np.asarray(block, dtype=np.float64)
+        channels = 1 if block.ndim == 1 else block.shape[1]
+        if channels != self.channels:
+            raise ValueError(f"expected {self.channels} channels, got {channels}")
+
+        self._file.write(self._to_bytes(block))
+        self.frames_written += len(block)
+
+    def close(self) -> None:
+        if self._file is None:
+            return
+
+        # Odd sized data chunks are padded to keep the RIFF chunks word aligned
+        if (self.frames_written * self.channels * self.bit_depth // 8) % 2:
+            self._file.write(b"\x00")
+
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> "WavWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
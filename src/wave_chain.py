@@ -1,15 +1,95 @@
 from collections.abc import Iterable, Iterator
+import numpy as np
+import numpy.typing as npt
 from src.oscillators.base_oscillator import Generator
-from src.modulator import TriggerableFloatGenerator, ModulatorType
-from typing import Union, Iterator, Callable, Tuple, Any
+from src.helpers.describe import describe_node, describe_value, type_name
+from src.modulator import (
+    ModulatedOscillator,
+    TriggerableFloatGenerator,
+    ModulatorType,
+    pull_block,
+    run_slower,
+)
+from typing import Union, Iterator, Callable, Tuple, Any, Dict, List
+
+# Peak level below which a generator that has ended counts as silent, -100dB
+SILENCE = 1e-5
+# Samples a generator has to stay silent for before it's pruned, so a ringing filter
+# isn't cut off as it passes through zero
+SILENT_SAMPLES = 64
+
+
+# Whether a generator has anything in it that ends, e.g. an envelope or a plucked string
+# A ModulatedOscillator or Chain with nothing to end reports ended straight away,
+# so their ended only means something when this is true
+def can_end(gen: Any) -> bool:
+    if isinstance(gen, WaveAdder):
+        return any(can_end(child) for child in gen.generators)
+    if isinstance(gen, Chain):
+        return can_end(gen.generator) or any(
+            isinstance(mod, TriggerableFloatGenerator) for mod in gen.modifiers
+        )
+    if isinstance(gen, ModulatedOscillator):
+        return can_end(gen.oscillator) or any(can_end(mod) for mod in gen.modulators)
+    return isinstance(gen, TriggerableFloatGenerator)
+
+
+# Samples a generator can stay silent for while it still has sound to come, e.g. between the echoes of a delay
+# Modifiers that hold sound back say how long for with a tail property
+def tail(gen: Any) -> int:
+    if isinstance(gen, WaveAdder):
+        return max((tail(child) for child in gen.generators), default=0)
+    if isinstance(gen, Chain):
+        held = sum(getattr(mod, "tail", 0) for mod in gen.modifiers)
+        return tail(gen.generator) + held
+    return 0
+
+
+# Watches a generator's output for when it can stop being rendered, once it has ended and then
+# stayed silent for longer than its tail, so a delay or reverb after an envelope still rings out
+class SilenceWatch:
+    def __init__(self, gen: Any) -> None:
+        self.gen = gen
+        self.reset()
+
+    # Worked out again when iterated, in case the graph has changed
+    def reset(self) -> None:
+        self.endable = can_end(self.gen)
+        self.hold = max(SILENT_SAMPLES, tail(self.gen) + 1)
+        self.quiet = 0
+
+    # val is the generator's latest n samples
+    # ended walks the graph, so it's only asked once the output has gone quiet
+    def finished(self, val: Any, n: int) -> bool:
+        if not self.endable or n == 0:
+            return False
+        if float(np.abs(val).max()) >= SILENCE or not getattr(self.gen, "ended", False):
+            self.quiet = 0
+            return False
+
+        self.quiet += n
+        return self.quiet >= self.hold
 
 
 # Wave adder composes in parallel multiple generators
+# Generators that have finished are pruned, they aren't rendered again until the adder is iterated
+# They still count towards the mix, so the level of the others doesn't jump when one drops out
 class WaveAdder(Generator):
     # By default stereo is false, no panning
     def __init__(self, *generators: Iterator, stereo: bool = False) -> None:
         self.generators: Tuple[Iterator, ...] = generators
         self.stereo: bool = stereo
+        self._live: List[bool] = [True] * len(generators)
+        self._watches = [SilenceWatch(gen) for gen in generators]
+
+    # Generators still being rendered
+    @property
+    def active(self) -> int:
+        return sum(self._live)
+
+    @property
+    def pruned(self) -> int:
+        return len(self.generators) - self.active
 
     def _mod_channels(
         self, _val: Union[float, int, Iterable]
@@ -23,10 +103,30 @@ class WaveAdder(Generator):
             val = sum(nums) / len(nums)
         return val
 
-    def trigger_release(self) -> None:
+    def _mod_channels_block(
+        self, val: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        if val.ndim == 1 and self.stereo:
+            return np.column_stack((val, val))
+        elif val.ndim == 2 and not self.stereo:
+            return val.mean(axis=1)
+        return val
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "generators": [describe_node(gen) for gen in self.generators],
+            "stereo": self.stereo,
+        }
+
+    def run_slower(self, period: int) -> None:
+        for gen in self.generators:
+            run_slower(gen, period)
+
+    def trigger_release(self, offset: int = 0) -> None:
         for gen in self.generators:
             if isinstance(gen, TriggerableFloatGenerator):
-                gen.trigger_release()
+                gen.trigger_release(offset)
 
     @property
     def ended(self) -> bool:
@@ -36,27 +136,61 @@ class WaveAdder(Generator):
         for gen in self.generators:
             iter(gen)
 
+        self._live = [True] * len(self.generators)
+        for watch in self._watches:
+            watch.reset()
         return self
 
     def __next__(self):
-        vals = [self._mod_channels(next(gen)) for gen in self.generators]
+        vals = []
+        for i, gen in enumerate(self.generators):
+            if self._live[i]:
+                val = next(gen)
+                self._live[i] = not self._watches[i].finished(val, 1)
+                vals.append(self._mod_channels(val))
 
+        count = len(self.generators)
         if self.stereo:
+            if not vals:
+                return (0.0, 0.0)
             l, r = zip(*vals)
-            return (sum(l) / len(l), sum(r) / len(r))
+            return (sum(l) / count, sum(r) / count)
         else:
-            return sum(vals) / len(vals)
+            return sum(vals) / count
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        out = np.zeros((n, 2) if self.stereo else n)
+        for i, gen in enumerate(self.generators):
+            if self._live[i]:
+                val = pull_block(gen, n)
+                self._live[i] = not self._watches[i].finished(val, n)
+                out += self._mod_channels_block(val)
+        return out / len(self.generators)
 
 
 # Chain takes a single generator and chains modifiers in sequence instead of parallel
+# Once the generator has finished it's no longer rendered, the modifiers are fed silence instead
+# so tails, e.g. of a delay, carry on
 class Chain:
     def __init__(
         self, generator: Union[Iterator[float], ModulatorType], *modifiers: Any
     ) -> None:
         self.generator: Union[Iterator[float], ModulatorType] = generator
         self.modifiers: Any = modifiers
+        # Modulated modifiers produce their own signal and are stepped along with the generator
+        self._modulated: Tuple[Any, ...] = tuple(
+            mod for mod in modifiers if isinstance(mod, Iterator)
+        )
+        self._source_watch = SilenceWatch(generator)
+        self._source_live = True
+        # Channels of the silence that stands in for a finished generator
+        self._source_channels = 1
 
     def __getattr__(self, attr: str):
+        # Before __init__ has run, e.g. while unpickling, there is nothing to look through yet
+        if "modifiers" not in self.__dict__:
+            raise AttributeError(f"attribute '{attr}' does not exist")
+
         if hasattr(self.generator, attr):
             return getattr(self.generator, attr)
 
@@ -66,13 +200,28 @@ class Chain:
 
         raise AttributeError(f"attribute '{attr}' does not exist")
 
-    def trigger_release(self) -> None:
-        for modulator in self.modulators:
-            if isinstance(modulator, TriggerableFloatGenerator):
-                modulator.trigger_release()
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "type": type_name(self),
+            "generator": describe_node(self.generator),
+            # Plain functions work as modifiers too, they are described by their code
+            "modifiers": [describe_value(mod) for mod in self.modifiers],
+        }
+
+    # Modifiers that keep time, e.g. filters, slow down with the generator,
+    # those that can't, e.g. delays and reverbs with buffers sized at full rate, raise TypeError
+    def run_slower(self, period: int) -> None:
+        run_slower(self.generator, period)
+        for mod in self.modifiers:
+            run_slower(mod, period)
+
+    def trigger_release(self, offset: int = 0) -> None:
+        if isinstance(self.generator, TriggerableFloatGenerator):
+            self.generator.trigger_release(offset)
 
-        if isinstance(self.oscillator, TriggerableFloatGenerator):
-            self.oscillator.trigger_release()
+        for mod in self.modifiers:
+            if isinstance(mod, TriggerableFloatGenerator):
+                mod.trigger_release(offset)
 
     @property
     def ended(self) -> bool:
@@ -92,21 +241,59 @@ class Chain:
 
     def __iter__(self) -> "Chain":
         iter(self.generator)
+        self._source_watch.reset()
+        self._source_live = True
 
+        for mod in self._modulated:
+            iter(mod)
+
+        # Modifiers with state, e.g. filters, start again from silence
         for mod in self.modifiers:
-            if isinstance(mod, TriggerableFloatGenerator):
-                iter(mod)
+            if hasattr(mod, "reset"):
+                mod.reset()
 
         return self
 
+    def _prune_source(self, val: Any, n: int) -> None:
+        if self._source_watch.finished(val, n):
+            self._source_live = False
+            stereo = isinstance(val, tuple) or np.ndim(val) == 2
+            self._source_channels = 2 if stereo else 1
+
     def __next__(self) -> float:
-        val = next(self.generator)
+        if self._source_live:
+            val = next(self.generator)
+            self._prune_source(val, 1)
+        else:
+            val = (0.0, 0.0) if self._source_channels == 2 else 0.0
 
-        for mod in self.modifiers:
-            if isinstance(mod, TriggerableFloatGenerator):
-                next(mod)
+        for mod in self._modulated:
+            next(mod)
 
         for mod in self.modifiers:
             val = mod(val)
 
         return val
+
+    def next_block(self, n: int) -> npt.NDArray[np.float64]:
+        if self._source_live:
+            val = pull_block(self.generator, n)
+            self._prune_source(val, n)
+        else:
+            val = np.zeros((n, 2) if self._source_channels == 2 else n)
+
+        for mod in self.modifiers:
+            modulated = mod in self._modulated
+            if hasattr(mod, "apply_block"):
+                ctrl = pull_block(mod, n) if modulated else None
+                val = mod.apply_block(val, ctrl)
+            else:
+                # Modifiers without a block path are applied sample by sample
+                vals = []
+                for v in val:
+                    if modulated:
+                        next(mod)
+                    vals.append(mod(v))
+                val = np.array(vals, dtype=np.float64)
+
+        return val
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from src.modifier import Delay, Volume
+from src.modulator import ControlRate
+from src.oscillators.oscillators import SineOscillator
+from src.oscillators.unison import UnisonOscillator
+from src.wave_chain import Chain, WaveAdder
+
+
+# Wrapped graphs slow down all the way through, so they keep their timing at control rate
+@pytest.mark.parametrize(
+    "build",
+    [
+        lambda: SineOscillator(2.0),
+        lambda: Chain(SineOscillator(2.0), Volume(1.0)),
+        lambda: WaveAdder(SineOscillator(2.0), SineOscillator(3.0)),
+        lambda: UnisonOscillator(SineOscillator(2.0), voices=3, random_phase=0.0),
+    ],
+)
+def test_control_rate_follows_full_rate(build) -> None:
+    full = iter(build()).next_block(44100)
+    slow = iter(ControlRate(build(), 64)).next_block(44100)
+    assert np.abs(full - slow).max() < 1e-3
+
+
+def test_control_rate_leaves_modulator_alone() -> None:
+    lfo = Chain(SineOscillator(2.0), Volume(1.0))
+    ControlRate(lfo, 64)
+    assert lfo.generator.describe()["sample_rate"] == 44100
+
+
+def test_control_rate_rejects_nodes_that_cant_slow_down() -> None:
+    with pytest.raises(TypeError):
+        ControlRate(Chain(SineOscillator(2.0), Delay(0.01)), 64)
@@ -0,0 +1,27 @@
+from typing import Any, Dict
+import pytest
+from src.patches import NODE_TYPES, parse_patch
+
+# Fields a node type can't be built without, the smallest graph of each type
+REQUIRED_FIELDS: Dict[str, Dict[str, Any]] = {
+    "unison": {"oscillator": {"type": "sine"}},
+    "plucked_strings": {"freqs": [110.0, 220.0]},
+    "control_rate": {"modulator": {"type": "adsr"}},
+    "modulated": {"oscillator": {"type": "sine"}},
+    "chain": {"generator": {"type": "sine"}},
+    "modulated_panner": {"modulator": {"type": "sine"}},
+    "modulated_volume": {"modulator": {"type": "adsr"}},
+    "reverb": {"ir": [1.0, 0.5, 0.25]},
+    "modulated_delay": {"modulator": {"type": "sine", "amp": 0.001}, "max_delay": 0.3},
+}
+
+
+# Every entry is (class, child fields), and its smallest patch parses into that class
+@pytest.mark.parametrize("kind", sorted(NODE_TYPES))
+def test_node_type_parses(kind: str) -> None:
+    entry = NODE_TYPES[kind]
+    assert len(entry) == 2 and isinstance(entry[0], type)
+
+    spec = {"type": kind, **REQUIRED_FIELDS.get(kind, {})}
+    node = parse_patch({"graph": spec}, f"NODE_TYPES['{kind}']")
+    assert type(node) is entry[0]
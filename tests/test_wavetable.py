@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from src.oscillators.oscillators import (
+    SawtoothOscillator,
+    SineOscillator,
+    SquareOscillator,
+    TriangleOscillator,
+)
+from src.oscillators.wavetable import WavetableOscillator
+
+NAIVE = {
+    "sine": SineOscillator,
+    "saw": SawtoothOscillator,
+    "square": SquareOscillator,
+    "triangle": TriangleOscillator,
+}
+
+
+# Circular lag that best lines up a with b
+def _lag(a: np.ndarray, b: np.ndarray) -> int:
+    return int(np.argmax([np.dot(np.roll(a, k), b) for k in range(len(a))]))
+
+
+# A wavetable is a drop in for its naive oscillator, so the first cycle should line up with it
+@pytest.mark.parametrize("waveform", sorted(NAIVE))
+@pytest.mark.parametrize("phase", [0.0, 45.0])
+def test_first_cycle_matches_naive_oscillator(waveform: str, phase: float) -> None:
+    cycle = 441
+    table = WavetableOscillator(100.0, phase, waveform=waveform).render(cycle)
+    naive = NAIVE[waveform](100.0, phase).render(cycle)
+
+    assert _lag(table, naive) == 0
+    # Band limiting rounds off the corners and the tables are normalised, but the shape is the same
+    assert np.corrcoef(table, naive)[0, 1] > 0.98